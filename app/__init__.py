@@ -5,6 +5,12 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from config import Config
 from app.models import db  
+from app.idempotency import init_idempotency
+from app.notification_hub import init_notification_hub
+from app.auth_cache import init_auth_cache
+from app.hashing import password_hasher
+from app.rate_limit import init_rate_limit
+from app.revocation import init_revocation
 
 # Initialize extensions (Migrate, CORS)
 migrate = Migrate()
@@ -28,12 +34,33 @@ def create_app():
     # Initialize JWTManager efter app-konfigurationen
     jwt = JWTManager(app)
 
+    # Blocklist of revoked tokens (logout, deleted users, role changes)
+    init_revocation(app, jwt)
+
+    # Idempotency-Key support for POST /book, /invoices and /subscriptions
+    init_idempotency(app)
+
+    # In-process pub/sub feeding the notification SSE streams
+    init_notification_hub(app)
+
+    # Cache of the user fields token_required needs (id, role, is_instructor)
+    init_auth_cache(app)
+
+    # Bounded thread pool for password hashing (login/register)
+    password_hasher.init_app(app)
+
+    # Token-bucket rate limits declared on the auth and write routes
+    init_rate_limit(app)
+
     # Importing models inside the function to avoid circular imports
     from app.models import User, Course, Booking, Notification, Category, Instructor
+    from app.caching import ensure_table_versions
+    from app import calendar_sync  # registers the booking -> calendar sync queue hook
 
     # Apply migrations (only if necessary)
     with app.app_context():
         db.create_all()  
+        ensure_table_versions()
 
     # Enable CORS (Cross-Origin Resource Sharing)
     CORS(app, origins=["http://localhost:3000", "http://localhost:3001"], supports_credentials=True, methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
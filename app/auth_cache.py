@@ -0,0 +1,59 @@
+from collections import namedtuple
+
+from sqlalchemy import event, select
+
+from app.lru import LRUCache
+from app.models import db, User
+
+# The part of a user that authorization checks need
+AuthUser = namedtuple('AuthUser', ['id', 'role', 'is_instructor'])
+
+# Bounded and TTL'd: commit hooks invalidate entries in this process, the TTL bounds staleness
+# for changes committed by other workers
+auth_user_cache = LRUCache(maxsize=10000, ttl=60)
+
+
+def init_auth_cache(app):
+    auth_user_cache.maxsize = app.config.get('AUTH_USER_CACHE_SIZE', 10000)
+    auth_user_cache.ttl = app.config.get('AUTH_USER_CACHE_TTL', 60)
+
+
+def load_auth_user(user_id):
+    auth_user = auth_user_cache.get(user_id)
+    if auth_user is not None:
+        return auth_user
+
+    row = db.session.execute(
+        select(User.id, User.role, User.is_instructor).where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    auth_user = AuthUser(row.id, row.role, bool(row.is_instructor))
+    auth_user_cache.set(user_id, auth_user)
+    return auth_user
+
+
+def invalidate_auth_user(user_id):
+    auth_user_cache.pop(user_id)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_user_changes(session, flush_context):
+    changed = session.info.setdefault('auth_users_changed', set())
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, User) and session.is_modified(obj):
+            changed.add(obj.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_user_changes(session):
+    for user_id in session.info.pop('auth_users_changed', ()):
+        invalidate_auth_user(user_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_user_changes(session):
+    session.info.pop('auth_users_changed', None)
@@ -0,0 +1,41 @@
+from sqlalchemy import select, insert
+
+from app.models import db, Booking, Notification
+from app.notification_hub import notification_hub, RESYNC
+
+BROADCAST_CHUNK_SIZE = 1000
+
+
+def course_recipients(course_id):
+    # Everyone booked on the course, from a single query over bookings
+    return db.session.execute(
+        select(Booking.user_id).where(Booking.course_id == course_id).distinct()
+    ).scalars().all()
+
+
+def broadcast_to_course(course_id, message, notification_type='announcement',
+                        chunk_size=BROADCAST_CHUNK_SIZE, progress=None):
+    # Multi-row INSERTs in chunks, all inside one transaction; progress(done, total) after each chunk
+    recipients = course_recipients(course_id)
+    total = len(recipients)
+    if progress:
+        progress(0, total)
+
+    try:
+        for start in range(0, total, chunk_size):
+            chunk = recipients[start:start + chunk_size]
+            db.session.execute(insert(Notification), [
+                {'user_id': user_id, 'message': message, 'type': notification_type, 'status': 'unread'}
+                for user_id in chunk
+            ])
+            if progress:
+                progress(start + len(chunk), total)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Bulk inserts bypass the flush hooks, so open streams are told to catch up from the table
+    for user_id in recipients:
+        notification_hub.publish(user_id, RESYNC)
+    return total
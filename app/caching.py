@@ -0,0 +1,83 @@
+import hashlib
+from functools import wraps
+
+from flask import request, make_response
+from sqlalchemy import event, select, update
+
+from app.models import db, TableVersion
+
+# Tables whose writes invalidate cached catalog responses
+VERSIONED_TABLES = ('courses', 'categories', 'users', 'instructors', 'subscriptions')
+
+table_versions = TableVersion.__table__
+
+
+def ensure_table_versions():
+    # Counters are only ever UPDATEd on write, so the rows have to exist up front
+    existing = set(db.session.execute(select(table_versions.c.table_name)).scalars())
+    missing = [name for name in VERSIONED_TABLES if name not in existing]
+    if missing:
+        db.session.execute(table_versions.insert(), [{'table_name': name, 'version': 0} for name in missing])
+        db.session.commit()
+
+
+def get_table_versions(tables):
+    # One small Core query; no ORM objects are loaded
+    rows = db.session.execute(
+        select(table_versions.c.table_name, table_versions.c.version)
+        .where(table_versions.c.table_name.in_(tables))
+    ).all()
+    return dict(rows)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _bump_table_versions(session, flush_context):
+    changed = set()
+    for obj in session.new | session.deleted:
+        changed.add(getattr(obj, '__tablename__', None))
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            changed.add(getattr(obj, '__tablename__', None))
+    changed = sorted(changed.intersection(VERSIONED_TABLES))
+    if not changed:
+        return
+
+    # Runs inside the flushing transaction, so the bump commits (or rolls back) with the write
+    bump_table_versions(session.connection(), changed)
+
+
+def bump_table_versions(connection, tables):
+    # For Core writes, which the flush listener does not see
+    for name in sorted(tables):
+        connection.execute(
+            update(table_versions)
+            .where(table_versions.c.table_name == name)
+            .values(version=table_versions.c.version + 1)
+        )
+
+
+def _compute_etag(tables):
+    versions = get_table_versions(tables)
+    key = '|'.join([request.path, request.query_string.decode()] +
+                   [f'{name}:{versions.get(name, 0)}' for name in tables])
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+# Strong ETag for GET routes whose body only depends on the URL and the given tables.
+# A matching If-None-Match is answered with 304 before the view (and the ORM) runs.
+def conditional(*tables, cache_control='no-cache'):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            etag = _compute_etag(tables)
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,229 @@
+import abc
+import random
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, select, update, bindparam, or_, and_
+
+from app.models import db, Booking, CalendarSyncJob, Course, User
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 30         # seconds before the first retry, doubled on every further attempt
+BACKOFF_MAX = 3600
+LEASE_TIMEOUT = 300       # an 'in_progress' job older than this is assumed lost and claimed again
+
+calendar_sync_jobs = CalendarSyncJob.__table__
+bookings = Booking.__table__
+
+# What a calendar client receives for one booking; event_id is set when the booking was synced before
+CalendarEvent = namedtuple('CalendarEvent', ['booking_id', 'event_id', 'user_email', 'title', 'start'])
+
+
+# Interface for calendar backends (e.g. Google Calendar)
+class CalendarClient(abc.ABC):
+    @abc.abstractmethod
+    def push_events(self, events):
+        # Create or update the events; return {booking_id: event_id or Exception}
+        pass
+
+
+# Offline client for tests and benchmarks: keeps events in memory, with optional latency and failures
+class FakeCalendarClient(CalendarClient):
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.events = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def push_events(self, events):
+        if self.latency:
+            time.sleep(self.latency)
+        results = {}
+        with self._lock:
+            self.calls += 1
+            for calendar_event in events:
+                if self.failure_rate and random.random() < self.failure_rate:
+                    results[calendar_event.booking_id] = RuntimeError('Simulated calendar failure')
+                    continue
+                event_id = calendar_event.event_id or f'fake-{uuid.uuid4().hex}'
+                self.events[event_id] = calendar_event
+                results[calendar_event.booking_id] = event_id
+        return results
+
+
+def backoff_delay(attempts):
+    delay = min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+# Enqueue in the same transaction as the booking write, so a committed booking is never lost
+@event.listens_for(db.session, 'after_flush')
+def _enqueue_calendar_sync(session, flush_context):
+    now = datetime.utcnow()
+    new_ids = [obj.id for obj in session.new if isinstance(obj, Booking)]
+    changed_ids = [
+        obj.id for obj in session.dirty
+        if isinstance(obj, Booking) and any(
+            db.inspect(obj).attrs[attr].history.has_changes() for attr in ('course_id', 'booking_date')
+        )
+    ]
+    if not new_ids and not changed_ids:
+        return
+
+    connection = session.connection()
+    if new_ids:
+        connection.execute(calendar_sync_jobs.insert(), [
+            {'booking_id': booking_id, 'status': 'pending', 'attempts': 0,
+             'next_attempt_at': now, 'updated_at': now}
+            for booking_id in new_ids
+        ])
+    if changed_ids:
+        # Only bookings that changed since their last push are sent again
+        connection.execute(
+            update(calendar_sync_jobs)
+            .where(calendar_sync_jobs.c.booking_id.in_(changed_ids))
+            .values(status='pending', attempts=0, next_attempt_at=now, last_error=None, updated_at=now,
+                    claim_token=None)
+        )
+
+
+def _claim_jobs(batch_size):
+    # Short transaction: pick due jobs (skipping rows other workers have locked) and stamp them with
+    # our claim token. The conditional UPDATE means a job is only ever claimed by one worker.
+    now = datetime.utcnow()
+    claimable = or_(
+        and_(calendar_sync_jobs.c.status == 'pending', calendar_sync_jobs.c.next_attempt_at <= now),
+        and_(calendar_sync_jobs.c.status == 'in_progress',
+             calendar_sync_jobs.c.updated_at < now - timedelta(seconds=LEASE_TIMEOUT))
+    )
+    job_ids = db.session.execute(
+        select(calendar_sync_jobs.c.id)
+        .where(claimable)
+        .order_by(calendar_sync_jobs.c.next_attempt_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not job_ids:
+        db.session.commit()
+        return []
+
+    token = uuid.uuid4().hex
+    db.session.execute(
+        update(calendar_sync_jobs)
+        .where(calendar_sync_jobs.c.id.in_(job_ids), claimable)
+        .values(status='in_progress', claim_token=token, updated_at=now)
+    )
+    rows = db.session.execute(
+        select(calendar_sync_jobs.c.id, calendar_sync_jobs.c.booking_id, calendar_sync_jobs.c.attempts,
+               calendar_sync_jobs.c.claim_token)
+        .where(calendar_sync_jobs.c.claim_token == token)
+    ).all()
+    db.session.commit()
+    return rows
+
+
+def _load_events(booking_ids):
+    rows = db.session.execute(
+        select(Booking.id, Booking.google_calendar_event_id, Booking.booking_date, User.email, Course.title)
+        .join(User, Booking.user_id == User.id)
+        .join(Course, Booking.course_id == Course.id)
+        .where(Booking.id.in_(booking_ids))
+    ).all()
+    db.session.commit()
+    return [CalendarEvent(row.id, row.google_calendar_event_id, row.email, row.title, row.booking_date)
+            for row in rows]
+
+
+def sync_batch(client, batch_size=50):
+    # Claim, push (outside any transaction) and record the results of one batch; returns jobs handled
+    jobs = _claim_jobs(batch_size)
+    if not jobs:
+        return 0
+
+    events = _load_events([job.booking_id for job in jobs])
+    try:
+        results = client.push_events(events)
+    except Exception as e:
+        results = {calendar_event.booking_id: e for calendar_event in events}
+
+    # Results are only recorded while we still hold the claim: a job re-enqueued by a booking change
+    # or taken over after the lease expired belongs to someone else now
+    token = jobs[0].claim_token
+    still_claimed = and_(calendar_sync_jobs.c.id == bindparam('job_id'),
+                         calendar_sync_jobs.c.claim_token == token,
+                         calendar_sync_jobs.c.status == 'in_progress')
+    now = datetime.utcnow()
+    synced = []
+    failed = []
+    for job in jobs:
+        result = results.get(job.booking_id, RuntimeError('Booking not found'))
+        if isinstance(result, Exception):
+            attempts = job.attempts + 1
+            failed.append({
+                'job_id': job.id,
+                'new_attempts': attempts,
+                'new_status': 'failed' if attempts >= MAX_ATTEMPTS else 'pending',
+                'retry_at': now + timedelta(seconds=backoff_delay(attempts)),
+                'error': str(result)[:1000],
+            })
+        else:
+            synced.append({'b_id': job.booking_id, 'job_id': job.id, 'event_id': result})
+
+    if synced:
+        db.session.execute(
+            update(bookings).where(bookings.c.id == bindparam('b_id'))
+            .values(google_calendar_event_id=bindparam('event_id')),
+            synced
+        )
+        db.session.execute(
+            update(calendar_sync_jobs).where(still_claimed)
+            .values(status='done', last_error=None, updated_at=now),
+            synced
+        )
+    if failed:
+        db.session.execute(
+            update(calendar_sync_jobs).where(still_claimed)
+            .values(status=bindparam('new_status'), attempts=bindparam('new_attempts'),
+                    next_attempt_at=bindparam('retry_at'), last_error=bindparam('error'),
+                    updated_at=now),
+            failed
+        )
+    db.session.commit()
+    return len(jobs)
+
+
+def run_worker(app, client, workers=4, batch_size=50, poll_interval=5.0, once=False):
+    # Worker pool: each thread keeps pulling batches until the queue is empty, then polls
+    stop = threading.Event()
+
+    def loop():
+        handled = 0
+        with app.app_context():
+            while not stop.is_set():
+                try:
+                    count = sync_batch(client, batch_size)
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception('Calendar sync batch failed')
+                    count = 0
+                finally:
+                    db.session.remove()
+                handled += count
+                if count == 0:
+                    if once:
+                        break
+                    stop.wait(poll_interval)
+        return handled
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(loop) for _ in range(workers)]
+        try:
+            return sum(future.result() for future in futures)
+        except KeyboardInterrupt:
+            stop.set()
+            raise
@@ -0,0 +1,37 @@
+from sqlalchemy import update
+from sqlalchemy.dialects import mysql, sqlite
+
+
+# Helpers for the summary tables kept up to date by flush hooks (category_facets, dashboard_stats)
+
+def upsert_increment(connection, table, key_values, increments):
+    # Adds increments ({column: delta}) to the row identified by key_values, creating it if missing.
+    # Single atomic statement, so concurrent writes cannot lose an update.
+    dialect = connection.dialect.name
+    values = dict(key_values, **increments)
+    added = {column: table.c[column] + delta for column, delta in increments.items()}
+    if dialect == 'mysql':
+        stmt = mysql.insert(table).values(**values).on_duplicate_key_update(**added)
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=list(key_values), set_=added)
+    else:
+        result = connection.execute(
+            update(table)
+            .where(*[table.c[column] == value for column, value in key_values.items()])
+            .values(**added)
+        )
+        if result.rowcount:
+            return
+        stmt = table.insert().values(**values)
+    connection.execute(stmt)
+
+
+def committed_value(state, attr):
+    # Value currently stored in the database for an attribute of a flushed object
+    history = state.attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return state.attrs[attr].value
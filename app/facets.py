@@ -0,0 +1,88 @@
+import bisect
+
+from sqlalchemy import event, case, func, select, delete
+
+from app.caching import bump_table_versions
+from app.counters import upsert_increment, committed_value
+from app.models import db, Course, CategoryFacet
+
+# Lower bounds of the price histogram buckets; the last bucket is open-ended
+PRICE_BUCKETS = (0, 100, 250, 500, 1000)
+
+category_facets = CategoryFacet.__table__
+
+
+def price_bucket(price):
+    return max(bisect.bisect_right(PRICE_BUCKETS, price or 0) - 1, 0)
+
+
+def _bucket_expression(price_column):
+    whens = [(price_column < upper, i) for i, upper in enumerate(PRICE_BUCKETS[1:])]
+    return case(*whens, else_=len(PRICE_BUCKETS) - 1)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _update_facets(session, flush_context):
+    deltas = {}
+
+    def add(category_id, price, delta):
+        key = (category_id, price_bucket(price))
+        deltas[key] = deltas.get(key, 0) + delta
+
+    for obj in session.new:
+        if isinstance(obj, Course):
+            add(obj.category_id, obj.price, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Course):
+            state = db.inspect(obj)
+            add(committed_value(state, 'category_id'), committed_value(state, 'price'), -1)
+    for obj in session.dirty:
+        if not isinstance(obj, Course):
+            continue
+        state = db.inspect(obj)
+        if state.attrs.category_id.history.has_changes() or state.attrs.price.history.has_changes():
+            add(committed_value(state, 'category_id'), committed_value(state, 'price'), -1)
+            add(obj.category_id, obj.price, 1)
+
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    # Same connection and transaction as the course write itself
+    connection = session.connection()
+    for (category_id, bucket), delta in sorted(deltas.items()):
+        upsert_increment(connection, category_facets, {'category_id': category_id, 'bucket': bucket},
+                         {'course_count': delta})
+
+
+def rebuild_facets():
+    # Full recomputation from the courses table, for recovery after out-of-band writes
+    bucket = _bucket_expression(Course.price).label('bucket')
+    counts = (
+        select(Course.category_id, bucket, func.count(Course.id))
+        .group_by(Course.category_id, bucket)
+    )
+    db.session.execute(delete(category_facets))
+    db.session.execute(
+        category_facets.insert().from_select(['category_id', 'bucket', 'course_count'], counts)
+    )
+    # Core writes skip the flush listener, so cached /categories/facets responses are invalidated here
+    bump_table_versions(db.session.connection(), ('courses', 'categories'))
+    db.session.commit()
+
+
+def get_facets():
+    # Reads only the aggregate rows: O(categories x buckets), independent of the number of courses
+    rows = db.session.execute(
+        select(category_facets.c.category_id, category_facets.c.bucket, category_facets.c.course_count)
+        .where(category_facets.c.course_count > 0)
+    ).all()
+    facets = {}
+    for category_id, bucket, count in rows:
+        facets.setdefault(category_id, {})[bucket] = count
+    return facets
+
+
+def bucket_bounds(bucket):
+    upper = PRICE_BUCKETS[bucket + 1] if bucket + 1 < len(PRICE_BUCKETS) else None
+    return PRICE_BUCKETS[bucket], upper
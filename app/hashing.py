@@ -0,0 +1,64 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    pass
+
+
+# Password hashing off the request thread: a bounded pool (hashlib releases the GIL while hashing)
+# with a cap on queued work, so a login burst is shed with 503s instead of stalling the worker.
+class PasswordHasher:
+    def __init__(self, method='scrypt', max_workers=None, max_pending=64, timeout=10):
+        self.method = method
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                                            thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._method_prefix = None
+
+    def init_app(self, app):
+        max_workers = app.config.get('PASSWORD_HASH_WORKERS')
+        previous = self._executor
+        self.method = app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                                            thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(app.config.get('PASSWORD_HASH_MAX_PENDING', 64))
+        self._method_prefix = None
+        # Hashes already queued on the old pool still finish; its threads exit afterwards
+        previous.shutdown(wait=False)
+
+    def _run(self, fn, *args):
+        slots = self._slots  # released on the semaphore it was taken from, even after init_app
+        if not slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        # The slot is freed when the hash finishes, even if the request stopped waiting for it
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HasherBusy()
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def needs_rehash(self, password_hash):
+        # Compares the stored parameters with the configured ones, e.g. 'pbkdf2:sha256:1000000'
+        if self._method_prefix is None:
+            self._method_prefix = generate_password_hash('', method=self.method).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._method_prefix
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,109 @@
+import hashlib
+import threading
+from functools import wraps
+
+from flask import current_app, request, jsonify, make_response
+
+from app.lru import LRUCache
+
+MAX_KEY_LENGTH = 255
+
+
+# Default store: completed responses in a bounded TTL'd LRU, in-flight requests as events.
+# A shared backend (e.g. Redis) only has to provide the same begin/wait/complete/release methods.
+class InMemoryIdempotencyStore:
+    def __init__(self, maxsize=10000, ttl=24 * 3600):
+        self._responses = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._in_flight = {}  # key -> (fingerprint, threading.Event)
+        self._lock = threading.Lock()
+
+    def begin(self, key, fingerprint):
+        # Returns ('new', None), ('done', response), ('in_flight', None) or ('mismatch', None)
+        with self._lock:
+            stored = self._responses.get(key)
+            if stored is not None:
+                if stored['fingerprint'] != fingerprint:
+                    return 'mismatch', None
+                return 'done', stored
+            if key in self._in_flight:
+                if self._in_flight[key][0] != fingerprint:
+                    return 'mismatch', None
+                return 'in_flight', None
+            self._in_flight[key] = (fingerprint, threading.Event())
+            return 'new', None
+
+    def wait(self, key, timeout):
+        with self._lock:
+            entry = self._in_flight.get(key)
+        return entry is None or entry[1].wait(timeout)
+
+    def complete(self, key, fingerprint, status, body, content_type):
+        self._responses.set(key, {
+            'fingerprint': fingerprint,
+            'status': status,
+            'body': body,
+            'content_type': content_type
+        })
+        self.release(key)
+
+    def release(self, key):
+        with self._lock:
+            entry = self._in_flight.pop(key, None)
+        if entry is not None:
+            entry[1].set()
+
+
+def init_idempotency(app):
+    store = app.config.get('IDEMPOTENCY_STORE')
+    if store is None:
+        store = InMemoryIdempotencyStore(
+            maxsize=app.config.get('IDEMPOTENCY_MAX_ENTRIES', 10000),
+            ttl=app.config.get('IDEMPOTENCY_TTL', 24 * 3600)
+        )
+    app.extensions['idempotency_store'] = store
+
+
+# Replays the stored response for a repeated Idempotency-Key without running the view again.
+# A duplicate that arrives while the first request is still running waits for its result.
+def idempotent(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'message': 'Idempotency-Key is too long'}), 400
+
+        store = current_app.extensions['idempotency_store']
+        scoped_key = f'{request.method}:{request.path}:{key}'
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        timeout = current_app.config.get('IDEMPOTENCY_WAIT_TIMEOUT', 10)
+
+        state, stored = store.begin(scoped_key, fingerprint)
+        while state == 'in_flight':
+            if not store.wait(scoped_key, timeout):
+                return jsonify({'message': 'A request with this Idempotency-Key is still in progress'}), 409
+            state, stored = store.begin(scoped_key, fingerprint)
+
+        if state == 'mismatch':
+            return jsonify({'message': 'Idempotency-Key was already used with a different request body'}), 422
+        if state == 'done':
+            response = make_response(stored['body'], stored['status'])
+            response.content_type = stored['content_type']
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            store.release(scoped_key)
+            raise
+
+        # Server errors are not stored, so the client can retry them
+        if response.status_code < 500:
+            store.complete(scoped_key, fingerprint, response.status_code,
+                           response.get_data(), response.content_type)
+        else:
+            store.release(scoped_key)
+        return response
+    return decorated_function
@@ -0,0 +1,76 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.lru import LRUCache
+
+
+# Status and progress of one background job
+class Job:
+    def __init__(self, kind, owner_id=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner_id = owner_id  # user who started the job; only they and admins may read it
+        self.status = 'queued'  # 'queued', 'running', 'done', 'failed'
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def report(self, done, total=None):
+        with self._lock:
+            self.done = done
+            if total is not None:
+                self.total = total
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'owner_id': self.owner_id,
+                'status': self.status,
+                'progress': {'done': self.done, 'total': self.total},
+                'result': self.result,
+                'error': self.error,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at
+            }
+
+
+# Small in-process job runner: a bounded thread pool plus the most recent jobs for status lookups.
+# Job status lives in the worker process that accepted the request.
+class JobRunner:
+    def __init__(self, max_workers=2, max_jobs=1000):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = LRUCache(maxsize=max_jobs)
+
+    def submit(self, app, kind, fn, *args, owner_id=None, **kwargs):
+        # fn(job, *args, **kwargs) runs inside an app context and may call job.report()
+        job = Job(kind, owner_id)
+        self._jobs.set(job.id, job)
+        self._executor.submit(self._run, app, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def _run(self, app, job, fn, args, kwargs):
+        job.status = 'running'
+        with app.app_context():
+            try:
+                job.result = fn(job, *args, **kwargs)
+                job.status = 'done'
+            except Exception as e:
+                app.logger.exception('Background job %s (%s) failed', job.id, job.kind)
+                job.error = str(e)
+                job.status = 'failed'
+            finally:
+                job.finished_at = datetime.utcnow()
+
+
+job_runner = JobRunner()
@@ -1,6 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from collections import namedtuple
 import enum
+import json
+
+from app.lru import LRUCache
 
 db = SQLAlchemy()
 
@@ -11,13 +15,13 @@ class User(db.Model):
     username = db.Column(db.String(100), unique=True, nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
-    role = db.Column(db.String(50), nullable=False)  # e.g., 'admin', 'instructor', 'student'
+    role = db.Column(db.String(50), nullable=False, index=True)  # e.g., 'admin', 'instructor', 'student'
     address = db.Column(db.String(255), nullable=True)
     zip_code = db.Column(db.String(20), nullable=True)
     city = db.Column(db.String(100), nullable=True)
     phone_number = db.Column(db.String(20), nullable=True)
     is_instructor = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     reg_number = db.Column(db.String(20), nullable=True)
     account_number = db.Column(db.String(50), nullable=True)
     # JWT Authentication Token (for login)
@@ -69,22 +73,78 @@ class Profile(db.Model):
     user = db.relationship('User', backref='profile', lazy=True)
 
 
+# One link attached to a course (video, document, ...)
+CourseResource = namedtuple('CourseResource', ['type', 'url', 'title'])
+
+_resources_cache = LRUCache(maxsize=2048)
+
+
+def parse_resources(raw):
+    # Accepts a list of {type, url, title} objects or a {type: [url or object, ...]} mapping
+    if not raw:
+        return ()
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        return ()
+
+    if isinstance(data, dict):
+        items = []
+        for resource_type, entries in data.items():
+            for entry in entries if isinstance(entries, list) else [entries]:
+                if isinstance(entry, dict):
+                    items.append(dict(entry, type=entry.get('type', resource_type)))
+                else:
+                    items.append({'type': resource_type, 'url': entry})
+    elif isinstance(data, list):
+        items = data
+    else:
+        return ()
+
+    resources = []
+    for item in items:
+        if isinstance(item, str):
+            item = {'url': item}
+        if isinstance(item, dict) and item.get('url'):
+            resources.append(CourseResource(item.get('type'), item['url'], item.get('title')))
+    return tuple(resources)
+
+
 # Course model
 class Course(db.Model):
     __tablename__ = 'courses'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(150), nullable=False)
     description = db.Column(db.Text, nullable=False)
-    price = db.Column(db.Float, nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    # active_history: the old value is loaded on assignment, even on an expired instance, so the
+    # category_facets flush hook always sees what it has to subtract
+    price = db.column_property(db.Column(db.Float, nullable=False), active_history=True)
+    category_id = db.column_property(db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False),
+                                     active_history=True)
     instructor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     resources = db.Column(db.Text, nullable=True)  # JSON structure with links to videos/documents
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # bumped on every update
+    capacity = db.Column(db.Integer, nullable=True)  # max number of bookings, None = unlimited
+    seats_booked = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Relationships
     instructor = db.relationship('User', backref='courses', lazy=True)
     bookings = db.relationship('Booking', backref='course', lazy=True)
     category = db.relationship('Category', backref='courses')
 
+    __mapper_args__ = {'version_id_col': version}
+
+    @property
+    def resource_list(self):
+        # Parsed once per (course, row version) and shared through a bounded LRU cache
+        key = (self.id, self.version)
+        parsed = _resources_cache.get(key)
+        if parsed is None:
+            parsed = parse_resources(self.resources)
+            if self.id is not None:
+                _resources_cache.set(key, parsed)
+        return parsed
+
 # Category model for courses
 class Category(db.Model):
     __tablename__ = 'categories'
@@ -96,18 +156,42 @@ class Booking(db.Model):
     __tablename__ = 'bookings'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    # active_history: old value loaded on assignment, for the dashboard_stats flush hook
+    course_id = db.column_property(db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False),
+                                   active_history=True)
     booking_date = db.Column(db.DateTime, default=datetime.utcnow)
     # Adding fields for calendar sync (Google Calendar integration)
     google_calendar_event_id = db.Column(db.String(255), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_bookings_user_id_booking_date', 'user_id', 'booking_date'),  # per-user booking history
+    )
+
+# Durable queue of bookings waiting to be pushed to the calendar (processed by app.calendar_sync)
+class CalendarSyncJob(db.Model):
+    __tablename__ = 'calendar_sync_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('bookings.id'), nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'in_progress', 'done', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    claim_token = db.Column(db.String(32), nullable=True, index=True)  # set by the worker that is processing the job
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_calendar_sync_jobs_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
 class Invoice(db.Model):
     __tablename__ = 'invoices'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    booking_id = db.Column(db.Integer, db.ForeignKey('bookings.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(50), nullable=False)  # 'paid', 'unpaid'
+    # active_history: old values loaded on assignment, for the dashboard_stats flush hook
+    booking_id = db.column_property(db.Column(db.Integer, db.ForeignKey('bookings.id'), nullable=False),
+                                    active_history=True)
+    amount = db.column_property(db.Column(db.Float, nullable=False), active_history=True)
+    status = db.column_property(db.Column(db.String(50), nullable=False), active_history=True)  # 'paid', 'unpaid'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Nye felter:
@@ -146,10 +230,27 @@ class Notification(db.Model):
     # Relationen til User (hvem modtager notifikationen)
     user = db.relationship('User', backref='notifications', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_notifications_user_id_status_created_at', 'user_id', 'status', 'created_at'),
+    )
+
     def __repr__(self):
         return f"<Notification {self.id} - {self.type} - {self.status}>"
 
 
+# Read notifications moved out of the hot table by app.retention
+class NotificationArchive(db.Model):
+    __tablename__ = 'notifications_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # same id as in notifications
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    message = db.Column(db.Text, nullable=False)
+    type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
 # Subscription model (for Stripe integration)
 class Subscription(db.Model):
     __tablename__ = 'subscriptions'
@@ -158,10 +259,45 @@ class Subscription(db.Model):
     plan_name = db.Column(db.String(50), nullable=False)  # e.g., 'basic', 'premium'
     start_date = db.Column(db.DateTime, default=datetime.utcnow)
     end_date = db.Column(db.DateTime, nullable=True)
-    status = db.Column(db.String(50), nullable=False)  # 'active', 'inactive', 'canceled'
+    # active_history: old value loaded on assignment, for the dashboard_stats flush hook
+    status = db.column_property(db.Column(db.String(50), nullable=False), active_history=True)  # 'active', 'inactive', 'canceled'
     stripe_subscription_id = db.Column(db.String(255), nullable=True)  # Stripe Subscription ID
 
 
     
     # Relationship
     user = db.relationship('User', backref='subscriptions')
+
+
+# Per-table write counters, bumped in the same transaction as the write (used for ETags)
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Precomputed course counts per category and price bucket (kept current by app.facets)
+class CategoryFacet(db.Model):
+    __tablename__ = 'category_facets'
+    category_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    bucket = db.Column(db.Integer, primary_key=True, autoincrement=False)  # index into app.facets.PRICE_BUCKETS
+    course_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Revoked JWTs: a single token (jti) or, with jti NULL, every token of user_id issued before revoked_at
+class TokenRevocation(db.Model):
+    __tablename__ = 'token_revocations'
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), nullable=True, unique=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False)  # after this the revoked tokens have expired anyway
+
+
+# Dashboard counters kept up to date by app.stats in the same transaction as the underlying writes
+class DashboardStat(db.Model):
+    __tablename__ = 'dashboard_stats'
+    metric = db.Column(db.String(64), primary_key=True)  # e.g. 'course_bookings', 'instructor_revenue'
+    subject_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # course/instructor id, 0 for totals
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0)
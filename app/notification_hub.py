@@ -0,0 +1,123 @@
+import queue
+import threading
+
+from sqlalchemy import event
+
+from app.models import db, Notification
+
+# Tells a subscriber to re-read the notifications table instead of trusting its queue
+RESYNC = object()
+
+
+# One open stream. The queue is bounded: when a slow client falls behind, further events are
+# dropped and the stream catches up from the notifications table instead.
+class Subscriber:
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        # Returns None when nothing arrived within the timeout
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        self.overflowed = False
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+# Fan-out inside this process only. A cross-worker backend (Redis pub/sub, Postgres NOTIFY, ...)
+# implements the same two methods and calls hub.deliver() for every message it receives.
+class LocalBackend:
+    def start(self, hub):
+        self._hub = hub
+
+    def publish(self, user_id, item):
+        self._hub.deliver(user_id, item)
+
+
+class NotificationHub:
+    def __init__(self):
+        self._subscribers = {}  # user_id -> set of Subscriber
+        self._lock = threading.Lock()
+        self.backend = LocalBackend()
+        self.backend.start(self)
+
+    def set_backend(self, backend):
+        self.backend = backend
+        backend.start(self)
+
+    def subscribe(self, user_id, maxsize=100):
+        subscriber = Subscriber(user_id, maxsize)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, user_id, item):
+        self.backend.publish(user_id, item)
+
+    def deliver(self, user_id, item):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscriber in subscribers:
+            subscriber.put(item)
+
+
+notification_hub = NotificationHub()
+
+
+def init_notification_hub(app):
+    backend = app.config.get('NOTIFICATION_HUB_BACKEND')
+    if backend is not None:
+        notification_hub.set_backend(backend)
+    app.extensions['notification_hub'] = notification_hub
+
+
+# Notifications are published once their transaction has committed
+@event.listens_for(db.session, 'after_flush')
+def _collect_notifications(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, Notification):
+            session.info.setdefault('notifications_to_publish', []).append({
+                'id': obj.id,
+                'user_id': obj.user_id,
+                'message': obj.message,
+                'type': obj.type,
+                'status': obj.status
+            })
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_notifications(session):
+    for item in session.info.pop('notifications_to_publish', ()):
+        notification_hub.publish(item['user_id'], item)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_notifications(session):
+    session.info.pop('notifications_to_publish', None)
@@ -0,0 +1,42 @@
+import base64
+import json
+
+from flask import request
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values):
+    # Opaque keyset cursor: the sort key of the last row on the page
+    raw = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    # Raises ValueError for anything that was not produced by encode_cursor
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def get_page_size(default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, maximum))
+
+
+def get_fields(available):
+    # ?fields=a,b,c restricts a list response to those keys; without it every key is returned
+    raw = request.args.get('fields')
+    if not raw:
+        return tuple(available)
+    requested = {field.strip() for field in raw.split(',') if field.strip()}
+    unknown = requested.difference(available)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(field for field in available if field in requested)
@@ -0,0 +1,89 @@
+import math
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+# Token buckets in process memory. Keys are spread over shards with their own lock so
+# concurrent requests rarely contend; each shard keeps at most max_keys buckets (LRU).
+class InMemoryRateLimitStore:
+    def __init__(self, shards=16, max_keys=10000):
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+        self._max_keys = max_keys
+
+    def take(self, key, rate, burst):
+        # Returns 0 when a token was taken, otherwise the seconds until one is available
+        lock, buckets = self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            tokens, updated = buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                buckets[key] = (tokens - 1, now)
+                wait = 0
+            else:
+                buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            buckets.move_to_end(key)
+            if len(buckets) > self._max_keys:
+                buckets.popitem(last=False)
+        return wait
+
+
+def init_rate_limit(app):
+    store = app.config.get('RATE_LIMIT_STORE')
+    if store is None:
+        store = InMemoryRateLimitStore(max_keys=app.config.get('RATE_LIMIT_MAX_KEYS', 10000))
+    app.extensions['rate_limit_store'] = store
+
+
+def _parse_limit(limit):
+    count, _, period = limit.partition('/')
+    return int(count), PERIODS[period.strip()]
+
+
+def _identities(scopes):
+    for scope in scopes:
+        if scope == 'ip':
+            yield 'ip', request.remote_addr or 'unknown'
+        elif scope == 'user':
+            # Only a valid token identifies a user; no database lookup is made here
+            try:
+                verify_jwt_in_request(optional=True)
+                user_id = get_jwt_identity()
+            except Exception:
+                user_id = None
+            if user_id is not None:
+                yield 'user', str(user_id)
+
+
+# Declares a limit such as '10/minute' for a route, counted per route and per client identity
+# ('ip', 'user'). burst defaults to the full count, i.e. the limit may be used up at once.
+def rate_limit(limit, scopes=('ip',), burst=None):
+    count, period = _parse_limit(limit)
+    rate = count / period
+    burst = burst or count
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_app.config.get('RATE_LIMIT_ENABLED', True):
+                return f(*args, **kwargs)
+            store = current_app.extensions['rate_limit_store']
+            for scope, identity in _identities(scopes):
+                wait = store.take(f'{request.endpoint}:{scope}:{identity}', rate, burst)
+                if wait:
+                    response = jsonify({'message': 'Too many requests'})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+                    return response
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
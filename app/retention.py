@@ -0,0 +1,62 @@
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete, func, literal
+
+from app.models import db, Notification, NotificationArchive
+
+notifications = Notification.__table__
+notifications_archive = NotificationArchive.__table__
+
+
+def _archivable(cutoff):
+    return (notifications.c.status == 'read') & (notifications.c.created_at < cutoff)
+
+
+def archive_read_notifications(max_age_days, batch_size=1000, dry_run=False, pause=0.0, progress=None):
+    # Moves read notifications older than max_age_days into notifications_archive.
+    # Each batch is its own short transaction (copy + delete by primary key), so locks are brief.
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+
+    if dry_run:
+        matched = db.session.execute(
+            select(func.count()).select_from(notifications).where(_archivable(cutoff))
+        ).scalar()
+        db.session.rollback()
+        return {'cutoff': cutoff, 'matched': matched, 'archived': 0, 'dry_run': True}
+
+    archived = 0
+    last_id = 0
+    while True:
+        ids = db.session.execute(
+            select(notifications.c.id)
+            .where(_archivable(cutoff), notifications.c.id > last_id)
+            .order_by(notifications.c.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            db.session.rollback()
+            break
+
+        try:
+            db.session.execute(notifications_archive.insert().from_select(
+                ['id', 'user_id', 'message', 'type', 'status', 'created_at', 'archived_at'],
+                select(notifications.c.id, notifications.c.user_id, notifications.c.message,
+                       notifications.c.type, notifications.c.status, notifications.c.created_at,
+                       literal(datetime.utcnow(), db.DateTime))
+                .where(notifications.c.id.in_(ids))
+            ))
+            db.session.execute(delete(notifications).where(notifications.c.id.in_(ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        archived += len(ids)
+        last_id = ids[-1]
+        if progress:
+            progress(archived)
+        if pause:
+            time.sleep(pause)
+
+    return {'cutoff': cutoff, 'matched': archived, 'archived': archived, 'dry_run': False}
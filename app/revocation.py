@@ -0,0 +1,161 @@
+import calendar
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, select
+
+from app.models import db, User, TokenRevocation
+
+SYNC_OVERLAP = 60  # seconds re-read on every sync, covers rows committed late or by skewed clocks
+
+token_revocations = TokenRevocation.__table__
+
+
+def _timestamp(dt):
+    return calendar.timegm(dt.utctimetuple())
+
+
+# In-memory mirror of token_revocations. is_revoked() never does I/O; a background thread
+# pulls new revocations from the table every sync_interval seconds.
+class RevocationList:
+    def __init__(self, sync_interval=5):
+        self.sync_interval = sync_interval
+        self._jtis = {}   # jti -> expiry timestamp
+        self._users = {}  # user_id -> (revoked_at timestamp, expiry timestamp)
+        self._lock = threading.Lock()
+        self._synced_until = None
+        self._thread = None
+
+    def add(self, jti, user_id, revoked_at, expires_at):
+        expires = _timestamp(expires_at)
+        with self._lock:
+            if jti is not None:
+                self._jtis[jti] = expires
+            elif user_id is not None:
+                revoked = _timestamp(revoked_at)
+                current = self._users.get(user_id)
+                if current is None or current[0] < revoked:
+                    self._users[user_id] = (revoked, expires)
+
+    def is_revoked(self, jwt_payload):
+        now = time.time()
+        jti_expiry = self._jtis.get(jwt_payload.get('jti'))
+        if jti_expiry is not None and jti_expiry > now:
+            return True
+        try:
+            user_id = int(jwt_payload.get('sub'))
+        except (TypeError, ValueError):
+            return False
+        user_entry = self._users.get(user_id)
+        # Tokens issued in the same second as the revocation are treated as revoked too
+        return user_entry is not None and user_entry[1] > now and jwt_payload.get('iat', 0) <= user_entry[0]
+
+    def sync(self):
+        # Incremental: only rows revoked since the previous sync (minus an overlap) are read
+        now = datetime.utcnow()
+        query = select(token_revocations.c.jti, token_revocations.c.user_id,
+                       token_revocations.c.revoked_at, token_revocations.c.expires_at) \
+            .where(token_revocations.c.expires_at > now)
+        if self._synced_until is not None:
+            query = query.where(token_revocations.c.revoked_at >= self._synced_until - timedelta(seconds=SYNC_OVERLAP))
+        rows = db.session.execute(query).all()
+        db.session.rollback()
+        for row in rows:
+            self.add(row.jti, row.user_id, row.revoked_at, row.expires_at)
+        self._synced_until = now
+        self._purge()
+
+    def _purge(self):
+        now = time.time()
+        with self._lock:
+            self._jtis = {jti: expiry for jti, expiry in self._jtis.items() if expiry > now}
+            self._users = {user_id: entry for user_id, entry in self._users.items() if entry[1] > now}
+
+    def ensure_started(self, app):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, args=(app,), daemon=True,
+                                            name='token-revocation-sync')
+        with app.app_context():
+            self.sync()
+        self._thread.start()
+
+    def _run(self, app):
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                with app.app_context():
+                    self.sync()
+            except Exception:
+                app.logger.exception('Token revocation sync failed')
+
+
+revocation_list = RevocationList()
+
+
+def _token_lifetime():
+    from flask import current_app
+    expires = current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES', timedelta(minutes=15))
+    if not expires:
+        return timedelta(days=365)  # tokens without expiry: keep the revocation for a year
+    return expires if isinstance(expires, timedelta) else timedelta(seconds=expires)
+
+
+def revoke_token(jti, expires_at=None, user_id=None):
+    # Adds the revocation to the current unit of work; the caller commits
+    if expires_at is None:
+        expires_at = datetime.utcnow() + _token_lifetime()
+    db.session.add(TokenRevocation(jti=jti, user_id=user_id, expires_at=expires_at))
+
+
+def revoke_user_tokens(user_id):
+    # Every token already issued to the user stops working (also used after role changes)
+    now = datetime.utcnow()
+    db.session.add(TokenRevocation(user_id=user_id, revoked_at=now, expires_at=now + _token_lifetime()))
+
+
+def init_revocation(app, jwt):
+    revocation_list.sync_interval = app.config.get('TOKEN_REVOCATION_SYNC_INTERVAL', 5)
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        revocation_list.ensure_started(app)
+        return revocation_list.is_revoked(jwt_payload)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _revoke_on_user_change(session, flush_context, instances):
+    # Deleting a user or changing their role invalidates the tokens they already hold
+    for obj in list(session.deleted) + list(session.dirty):
+        if not isinstance(obj, User):
+            continue
+        state = db.inspect(obj)
+        if obj in session.deleted or state.attrs.role.history.has_changes() \
+                or state.attrs.is_instructor.history.has_changes():
+            now = datetime.utcnow()
+            session.add(TokenRevocation(user_id=obj.id, revoked_at=now, expires_at=now + _token_lifetime()))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_revocations(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, TokenRevocation):
+            session.info.setdefault('revocations', []).append(
+                (obj.jti, obj.user_id, obj.revoked_at, obj.expires_at)
+            )
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_revocations(session):
+    # This worker applies its own revocations at once; others pick them up on their next sync
+    for revocation in session.info.pop('revocations', ()):
+        revocation_list.add(*revocation)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_revocations(session):
+    session.info.pop('revocations', None)
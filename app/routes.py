@@ -1,16 +1,35 @@
 import datetime
-from flask import Blueprint, jsonify, request, app
+from flask import Blueprint, jsonify, request, app, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from app.models import db, User, Course, Booking, Notification, Subscription, Invoice, Category, Profile, Instructor, InvoiceTemplateSetting
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import select, insert, update, or_, and_, func
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload, load_only
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required
 from datetime import timedelta
 from functools import wraps
+from contextlib import contextmanager
 from flask import request, jsonify
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
+from app.pagination import encode_cursor, decode_cursor, get_page_size, get_fields
+from app.search import course_index, fallback_search
+from app.caching import conditional
+from app.idempotency import idempotent
+from app.notification_hub import notification_hub, RESYNC
+from app.jobs import job_runner
+from app.broadcasts import broadcast_to_course
+from app.auth_cache import load_auth_user, auth_user_cache
+from app.hashing import password_hasher, HasherBusy
+from app.rate_limit import rate_limit
+from app.facets import get_facets, bucket_bounds, PRICE_BUCKETS
+from app.revocation import revoke_token
+from app.user_removal import remove_user
+from app.stats import get_stats
 import os
+import json
+import csv
+import io
 
 
 #Indlæs miljøvariabler fra .env filen
@@ -19,6 +38,11 @@ load_dotenv()
 # Create Blueprint for routes
 main_routes = Blueprint('main_routes', __name__)
 
+EXPORT_BATCH_SIZE = 500  # rows per fetch when streaming /courses/export
+MAX_BATCH_BOOKINGS = 500  # items accepted by one /book/batch request
+STREAM_REPLAY_BATCH_SIZE = 100  # notifications per query when a stream catches up from the table
+STREAM_RETRY_MS = 3000  # reconnect delay suggested to EventSource clients
+
 @main_routes.route('/', methods=['GET'])
 def home():
     return jsonify({'message': 'Backend is running'}), 200
@@ -27,21 +51,67 @@ def home():
 def about():
     return jsonify({'message': 'Backend is running'}), 200
 
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 
+# Passes the cached authorization view of the user (id, role, is_instructor) to the route
 def token_required(f):
     @wraps(f)
     @jwt_required()
     def decorated_function(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
+        try:
+            current_user_id = int(get_jwt_identity())
+        except (TypeError, ValueError):
+            return jsonify({'message': 'User not found'}), 404
+        current_user = load_auth_user(current_user_id)
         if current_user is None:
             return jsonify({'message': 'User not found'}), 404
         return f(current_user, *args, **kwargs)
     return decorated_function
 
+# Run the block as one transaction: a single commit at the end, rollback on any error
+@contextmanager
+def unit_of_work():
+    try:
+        yield db.session
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+class CourseFullError(Exception):
+    pass
+
+# Claim seats on a course with a conditional atomic UPDATE (never read-then-write).
+# Returns the number of seats granted; with partial=True a batch takes whatever is left.
+def reserve_seats(course_id, seats=1, partial=False):
+    courses = Course.__table__
+    result = db.session.execute(
+        update(courses)
+        .where(courses.c.id == course_id,
+               or_(courses.c.capacity.is_(None), courses.c.seats_booked + seats <= courses.c.capacity))
+        .values(seats_booked=courses.c.seats_booked + seats)
+    )
+    if result.rowcount or not partial:
+        return seats if result.rowcount else 0
+
+    # Not enough room for all of them: lock the row and take the remaining seats
+    row = db.session.execute(
+        select(courses.c.capacity, courses.c.seats_booked)
+        .where(courses.c.id == course_id)
+        .with_for_update()
+    ).first()
+    available = max(row.capacity - row.seats_booked, 0) if row else 0
+    if available:
+        db.session.execute(
+            update(courses)
+            .where(courses.c.id == course_id)
+            .values(seats_booked=courses.c.seats_booked + available)
+        )
+    return available
+
 # Register a new user 
 @main_routes.route('/register', methods=['POST'])
+@rate_limit('5/minute')
 def register():
     data = request.get_json()
 
@@ -58,7 +128,10 @@ def register():
     if existing_user:
         return jsonify({'message': 'Email already exists'}), 400
 
-    password_hash = generate_password_hash(password)
+    try:
+        password_hash = password_hasher.hash(password)
+    except HasherBusy:
+        return busy_response()
     address = data['address']
     phone_number = data['phone_number']
     is_instructor = data['is_instructor']
@@ -74,15 +147,15 @@ def register():
     )
 
     try:
-        db.session.add(new_user)
-        db.session.commit()
+        with unit_of_work():
+            db.session.add(new_user)
         return jsonify({'message': 'User registered successfully'}), 201
     except SQLAlchemyError as e:
-        db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
 
-#@main_routes.route('/login', methods=['POST'])
+@main_routes.route('/login', methods=['POST'])
+@rate_limit('10/minute')
 def login():
     data = request.get_json()
 
@@ -96,10 +169,23 @@ def login():
     # Find brugeren i databasen
     user = User.query.filter_by(email=email).first()
 
-    # Hvis brugeren findes, og password er korrekt
-    if user and check_password_hash(user.password_hash, password):
+    # Hvis brugeren findes, og password er korrekt (verified in the bounded hashing pool)
+    try:
+        valid = user is not None and password_hasher.verify(user.password_hash, password)
+    except HasherBusy:
+        return busy_response()
+
+    if valid:
+        # Upgrade hashes made with older parameters while we have the plain password
+        if password_hasher.needs_rehash(user.password_hash):
+            try:
+                with unit_of_work():
+                    user.password_hash = password_hasher.hash(password)
+            except (HasherBusy, SQLAlchemyError):
+                pass  # the old hash still works; try again on the next login
+
         # Opret en JWT token
-        token = create_access_token(identity=user.id)
+        token = create_access_token(identity=str(user.id))
         
         # Tjek om brugeren er en admin
         is_admin = user.role == 'admin'
@@ -113,31 +199,199 @@ def login():
     else:
         return jsonify({'message': 'Invalid credentials'}), 401
 
+# 503 when the password hashing pool is saturated
+def busy_response():
+    response = jsonify({'message': 'Server busy, please retry'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+# Revoke the token used for this request; it is rejected by every worker within one sync interval
+@main_routes.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    token = get_jwt()
+    try:
+        with unit_of_work():
+            expires_at = datetime.datetime.utcfromtimestamp(token['exp']) if 'exp' in token else None
+            revoke_token(token['jti'], expires_at, user_id=int(get_jwt_identity()))
+    except SQLAlchemyError as e:
+        return jsonify({'message': str(e)}), 500
+    return jsonify({'message': 'Logged out'}), 200
+
+# Fields a client can pick with ?fields= on GET /courses, and the column each one needs
+COURSE_LIST_FIELDS = {
+    'id': Course.id,
+    'title': Course.title,
+    'description': Course.description,
+    'price': Course.price,
+    'instructor': Course.instructor_id,
+}
+
 @main_routes.route('/courses', methods=['GET'])
+@conditional('courses', 'users', cache_control='public, max-age=60')
 def get_courses():
-    courses = Course.query.all()
+    try:
+        fields = get_fields(COURSE_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    # Only the requested columns are selected, so large Text columns stay in the database
+    columns = [COURSE_LIST_FIELDS[field] for field in fields]
+    query = Course.query.options(load_only(Course.id, *columns))
+    if 'instructor' in fields:
+        # Instructor is loaded in the same query instead of one lazy load per course
+        query = query.options(joinedload(Course.instructor).load_only(User.id, User.username))
+
+    category_id = request.args.get('category_id', type=int)
+    instructor_id = request.args.get('instructor_id', type=int)
+    if category_id is not None:
+        query = query.filter(Course.category_id == category_id)
+    if instructor_id is not None:
+        query = query.filter(Course.instructor_id == instructor_id)
+
+    # Paginated mode (keyset on Course.id) when the client asks for a page
+    paginated = 'limit' in request.args or 'cursor' in request.args
+    if paginated:
+        limit = get_page_size()
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                (last_id,) = decode_cursor(cursor)
+                last_id = int(last_id)
+            except (ValueError, TypeError):
+                return jsonify({'message': 'Invalid cursor'}), 400
+            query = query.filter(Course.id > last_id)
+        courses = query.order_by(Course.id).limit(limit + 1).all()
+        has_more = len(courses) > limit
+        courses = courses[:limit]
+    else:
+        courses = query.order_by(Course.id).all()
+
     course_list = []
 
     for course in courses:
-        course_list.append({
-            "id": course.id,
-            "title": course.title,
-            "description": course.description,
-            "price": course.price,
-            "instructor": {
+        item = {field: getattr(course, field) for field in fields if field != 'instructor'}
+        if 'instructor' in fields:
+            item["instructor"] = {
                 "id": course.instructor.id,
                 "username": course.instructor.username
             }
-        })
+        course_list.append(item)
+
+    if paginated:
+        next_cursor = encode_cursor(courses[-1].id) if has_more else None
+        return jsonify({"courses": course_list, "next_cursor": next_cursor}), 200
 
     return jsonify({"courses": course_list}), 200
 
+# Full catalog as newline-delimited JSON, streamed from a server-side cursor
+@main_routes.route('/courses/export', methods=['GET'])
+def export_courses():
+    stmt = (
+        select(Course.id, Course.title, Course.description, Course.price, Course.category_id,
+               User.id.label('instructor_id'), User.username.label('instructor_username'))
+        .join(User, Course.instructor_id == User.id)
+        .order_by(Course.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    def generate():
+        # Rows are fetched EXPORT_BATCH_SIZE at a time, so memory stays flat for any catalog size
+        for row in db.session.execute(stmt):
+            yield json.dumps({
+                "id": row.id,
+                "title": row.title,
+                "description": row.description,
+                "price": row.price,
+                "category_id": row.category_id,
+                "instructor": {
+                    "id": row.instructor_id,
+                    "username": row.instructor_username
+                }
+            }) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# Ranked full-text search over course title, description and category name
+@main_routes.route('/courses/search', methods=['GET'])
+def search_courses():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'message': 'Missing search query'}), 400
+
+    limit = get_page_size(default=10, maximum=50)
+    prefix = request.args.get('prefix', '1') != '0'
+
+    course_index.ensure_fresh(current_app.config.get('SEARCH_INDEX_MAX_AGE'))
+    if course_index.is_built:
+        results = course_index.search(query, limit=limit, prefix=prefix)
+    else:
+        # First requests after startup, while the index builds in the background
+        results = fallback_search(query, limit=limit)
+    if not results:
+        return jsonify({'courses': []}), 200
+
+    scores = dict(results)
+    courses = Course.query.options(
+        load_only(Course.id, Course.title, Course.price, Course.category_id)
+    ).filter(Course.id.in_(scores)).all()
+    courses.sort(key=lambda course: scores[course.id], reverse=True)
+
+    return jsonify({'courses': [{
+        'id': course.id,
+        'title': course.title,
+        'price': course.price,
+        'category_id': course.category_id,
+        'score': round(scores[course.id], 4)
+    } for course in courses]}), 200
+
+# Course counts and price histogram per category, served from precomputed aggregates
+@main_routes.route('/categories/facets', methods=['GET'])
+@conditional('courses', 'categories', cache_control='public, max-age=60')
+def get_category_facets():
+    facets = get_facets()
+    categories = Category.query.order_by(Category.id).all()
+
+    categories_list = []
+    for category in categories:
+        buckets = facets.get(category.id, {})
+        price_buckets = []
+        for bucket in range(len(PRICE_BUCKETS)):
+            lower, upper = bucket_bounds(bucket)
+            price_buckets.append({'min': lower, 'max': upper, 'count': buckets.get(bucket, 0)})
+        categories_list.append({
+            'id': category.id,
+            'name': category.name,
+            'course_count': sum(buckets.values()),
+            'price_buckets': price_buckets
+        })
+
+    return jsonify({'categories': categories_list}), 200
+
+# Resources (video/document links) for one course; kept out of the listings
+@main_routes.route('/courses/<int:course_id>/resources', methods=['GET'])
+@conditional('courses', cache_control='public, max-age=300')
+def get_course_resources(course_id):
+    course = Course.query.options(
+        load_only(Course.id, Course.version, Course.resources)
+    ).filter_by(id=course_id).first()
+    if not course:
+        return jsonify({'message': 'Course not found'}), 404
+
+    return jsonify({
+        'course_id': course.id,
+        'resources': [resource._asdict() for resource in course.resource_list]
+    }), 200
+
 @main_routes.route('/courses', methods=["OPTIONS"])
 def options_courses():
     return '', 200  # Allow CORS preflight request for this endpoint
 
 # Book a course
 @main_routes.route('/book', methods=['POST'])
+@rate_limit('30/minute', scopes=('ip', 'user'))
+@idempotent
 def book_course():
     data = request.get_json()
 
@@ -158,17 +412,155 @@ def book_course():
     new_booking = Booking(user_id=user_id, course_id=course_id)
 
     try:
-        db.session.add(new_booking)
-        db.session.commit()
-        # Create a notification for the user
-        notification_message = f"Your booking for the course '{course.title}' was successful."
-        create_notification(user_id, notification_message, 'booking')
+        # Booking and notification are flushed and committed together
+        with unit_of_work():
+            # Seat is claimed first: the exclusive lock on the course row is then already held when
+            # the booking INSERT checks its foreign key, so two bookings cannot deadlock on it
+            if not reserve_seats(course_id):
+                raise CourseFullError()
+            db.session.add(new_booking)
+            # Create a notification for the user
+            notification_message = f"Your booking for the course '{course.title}' was successful."
+            create_notification(user_id, notification_message, 'booking')
         return jsonify({'message': 'Booking successful'}), 201
+    except CourseFullError:
+        return jsonify({'message': 'Course is fully booked'}), 409
     except SQLAlchemyError as e:
-        db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
-# Create a new notification
+# Book many (user_id, course_id) pairs at once: two lookups and a single commit for the whole batch
+@main_routes.route('/book/batch', methods=['POST'])
+@rate_limit('10/minute', scopes=('ip', 'user'))
+@idempotent
+def book_courses_batch():
+    data = request.get_json()
+
+    if not data or not isinstance(data.get('bookings'), list):
+        return jsonify({'message': 'Missing required fields'}), 400
+
+    items = data['bookings']
+    if len(items) > MAX_BATCH_BOOKINGS:
+        return jsonify({'message': f'At most {MAX_BATCH_BOOKINGS} bookings per request'}), 400
+
+    def is_valid(item):
+        return isinstance(item, dict) and all(isinstance(item.get(k), int) for k in ['user_id', 'course_id'])
+
+    user_ids = {item['user_id'] for item in items if is_valid(item)}
+    course_ids = {item['course_id'] for item in items if is_valid(item)}
+    existing_users = set(db.session.execute(select(User.id).where(User.id.in_(user_ids))).scalars())
+    course_titles = dict(db.session.execute(
+        select(Course.id, Course.title).where(Course.id.in_(course_ids))
+    ).all())
+
+    results = []
+    requested_seats = {}
+    for index, item in enumerate(items):
+        if not is_valid(item):
+            results.append({'index': index, 'status': 'error', 'message': 'Missing required fields'})
+        elif item['user_id'] not in existing_users:
+            results.append({'index': index, 'status': 'error', 'message': 'User not found'})
+        elif item['course_id'] not in course_titles:
+            results.append({'index': index, 'status': 'error', 'message': 'Course not found'})
+        else:
+            requested_seats[item['course_id']] = requested_seats.get(item['course_id'], 0) + 1
+            results.append({'index': index, 'status': 'booked', 'item': item})
+
+    new_bookings = []
+    try:
+        # One transaction for the whole batch
+        with unit_of_work():
+            # One conditional UPDATE per course, in id order so concurrent batches cannot deadlock
+            granted = {course_id: reserve_seats(course_id, seats, partial=True)
+                       for course_id, seats in sorted(requested_seats.items())}
+
+            for result in results:
+                item = result.pop('item', None)
+                if item is None:
+                    continue
+                if not granted[item['course_id']]:
+                    result.update({'status': 'error', 'message': 'Course is fully booked'})
+                    continue
+                granted[item['course_id']] -= 1
+                result['booking'] = Booking(user_id=item['user_id'], course_id=item['course_id'])
+                new_bookings.append(result['booking'])
+
+            # Bookings go through the ORM, since the calendar sync and stats hooks need their ids.
+            # MySQL and SQLite cannot return autoincrement ids for a multi-row INSERT, so this is one
+            # INSERT per booking there. Ids are read here, before the commit expires the objects.
+            db.session.add_all(new_bookings)
+            db.session.flush()
+            for result in results:
+                booking = result.pop('booking', None)
+                if booking is not None:
+                    result['booking_id'] = booking.id
+
+            # Nothing needs the notifications' ids: a single executemany INSERT
+            notifications = [
+                {
+                    'user_id': booking.user_id,
+                    'message': f"Your booking for the course '{course_titles[booking.course_id]}' was successful.",
+                    'type': 'booking',
+                    'status': 'unread'
+                }
+                for booking in new_bookings
+            ]
+            if notifications:
+                db.session.execute(insert(Notification), notifications)
+    except SQLAlchemyError as e:
+        return jsonify({'message': str(e)}), 500
+
+    # Bulk inserts bypass the flush hooks, so open streams are told to catch up from the table
+    for user_id in {notification['user_id'] for notification in notifications}:
+        notification_hub.publish(user_id, RESYNC)
+
+    return jsonify({'results': results, 'booked': len(new_bookings)}), 200
+
+# A user's bookings, newest first, with the course title and price from the same query
+@main_routes.route('/users/<int:user_id>/bookings', methods=['GET'])
+def get_user_bookings(user_id):
+    limit = get_page_size()
+    query = (
+        select(Booking.id, Booking.booking_date, Course.id.label('course_id'), Course.title, Course.price)
+        .join(Course, Booking.course_id == Course.id)
+        .where(Booking.user_id == user_id)
+    )
+
+    # Keyset on (booking_date, id), which walks the (user_id, booking_date) index
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            booking_date, booking_id = decode_cursor(cursor)
+            booking_date = datetime.datetime.fromisoformat(booking_date)
+            booking_id = int(booking_id)
+        except (ValueError, TypeError):
+            return jsonify({'message': 'Invalid cursor'}), 400
+        query = query.where(or_(
+            Booking.booking_date < booking_date,
+            and_(Booking.booking_date == booking_date, Booking.id < booking_id)
+        ))
+
+    rows = db.session.execute(
+        query.order_by(Booking.booking_date.desc(), Booking.id.desc()).limit(limit + 1)
+    ).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].booking_date.isoformat(), rows[-1].id)
+
+    bookings_list = []
+    for row in rows:
+        bookings_list.append({
+            'id': row.id,
+            'booking_date': row.booking_date,
+            'course': {
+                'id': row.course_id,
+                'title': row.title,
+                'price': row.price
+            }
+        })
+    return jsonify({'bookings': bookings_list, 'next_cursor': next_cursor}), 200
+
+# Create a new notification (added to the current unit of work; the caller commits)
 def create_notification(user_id, message, notification_type):
     notification = Notification(
         user_id=user_id,
@@ -177,26 +569,68 @@ def create_notification(user_id, message, notification_type):
         status='unread'
     )
     db.session.add(notification)
-    db.session.commit()
+    return notification
 
 # Get notifications for a user
+NOTIFICATION_LIST_FIELDS = {
+    'id': Notification.id,
+    'message': Notification.message,
+    'type': Notification.type,
+    'status': Notification.status,
+    'created_at': Notification.created_at,
+}
+
 @main_routes.route('/notifications/<int:user_id>', methods=['GET'])
 def get_notifications(user_id):
-    notifications = Notification.query.filter_by(user_id=user_id).all()
-
-    if not notifications:
-        return jsonify({'message': 'No notifications found'}), 404
+    try:
+        fields = get_fields(NOTIFICATION_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    limit = get_page_size()
+    query = Notification.query.options(
+        load_only(Notification.id, Notification.created_at, *[NOTIFICATION_LIST_FIELDS[field] for field in fields])
+    ).filter(Notification.user_id == user_id)
+
+    # ?status=unread uses the (user_id, status, created_at) index directly
+    status = request.args.get('status')
+    if status:
+        query = query.filter(Notification.status == status)
+
+    # ?before=<cursor> continues after the last notification of the previous page (newest first)
+    before = request.args.get('before')
+    if before:
+        try:
+            created_at, notification_id = decode_cursor(before)
+            created_at = datetime.datetime.fromisoformat(created_at)
+            notification_id = int(notification_id)
+        except (ValueError, TypeError):
+            return jsonify({'message': 'Invalid cursor'}), 400
+        query = query.filter(or_(
+            Notification.created_at < created_at,
+            and_(Notification.created_at == created_at, Notification.id < notification_id)
+        ))
+
+    notifications = query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        last = notifications[-1]
+        next_cursor = encode_cursor(last.created_at.isoformat(), last.id)
 
     notifications_list = []
     for notification in notifications:
-        notifications_list.append({
-            'id': notification.id,
-            'message': notification.message,
-            'type': notification.type,
-            'status': notification.status,
-            'created_at': notification.created_at
-        })
-    return jsonify({'notifications': notifications_list}), 200
+        notifications_list.append({field: getattr(notification, field) for field in fields})
+    return jsonify({'notifications': notifications_list, 'next_cursor': next_cursor}), 200
+
+# Badge count: a COUNT over the (user_id, status, created_at) index, no rows are read
+@main_routes.route('/notifications/<int:user_id>/unread_count', methods=['GET'])
+def get_unread_notification_count(user_id):
+    count = db.session.execute(
+        select(func.count()).select_from(Notification)
+        .where(Notification.user_id == user_id, Notification.status == 'unread')
+    ).scalar()
+    return jsonify({'unread_count': count}), 200
 
 # Mark notification as read
 @main_routes.route('/notifications/<int:notification_id>/read', methods=['POST'])
@@ -208,8 +642,138 @@ def mark_notification_as_read(notification_id):
         return jsonify({'message': 'Notification marked as read'}), 200
     return jsonify({'message': 'Notification not found'}), 404
 
+# Server-Sent Events stream of new notifications for a user (replaces polling)
+@main_routes.route('/notifications/<int:user_id>/stream', methods=['GET'])
+def stream_notifications(user_id):
+    app = current_app._get_current_object()
+    heartbeat = app.config.get('NOTIFICATION_STREAM_HEARTBEAT', 15)
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('last_event_id', type=int)
+
+    def format_event(item):
+        return f"id: {item['id']}\nevent: notification\ndata: {json.dumps(item)}\n\n"
+
+    def replay(since_id):
+        # Catch up from the table in short app contexts; the connection is released after each page
+        while True:
+            with app.app_context():
+                rows = db.session.execute(
+                    select(Notification.id, Notification.user_id, Notification.message,
+                           Notification.type, Notification.status)
+                    .where(Notification.user_id == user_id, Notification.id > since_id)
+                    .order_by(Notification.id)
+                    .limit(STREAM_REPLAY_BATCH_SIZE)
+                ).all()
+            for row in rows:
+                yield dict(row._mapping)
+            if len(rows) < STREAM_REPLAY_BATCH_SIZE:
+                return
+            since_id = rows[-1].id
+
+    def generate():
+        nonlocal last_id
+        subscriber = None
+        try:
+            # Subscribed only once streaming starts: a response closed before its first chunk never
+            # runs this generator, so it must not leave a subscriber behind. Subscribe before reading
+            # the table, so nothing committed in between is missed.
+            subscriber = notification_hub.subscribe(user_id, app.config.get('NOTIFICATION_STREAM_QUEUE_SIZE', 100))
+            if last_id is None:
+                # Short app context: an idle stream must not hold a database connection
+                with app.app_context():
+                    last_id = db.session.execute(
+                        select(func.max(Notification.id)).where(Notification.user_id == user_id)
+                    ).scalar() or 0
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            for item in replay(last_id):
+                last_id = item['id']
+                yield format_event(item)
+            while True:
+                item = subscriber.get(timeout=heartbeat)
+                if item is None:
+                    yield ": heartbeat\n\n"
+                elif item is RESYNC or subscriber.overflowed:
+                    subscriber.drain()
+                    for replayed in replay(last_id):
+                        last_id = replayed['id']
+                        yield format_event(replayed)
+                elif item['id'] > last_id:
+                    last_id = item['id']
+                    yield format_event(item)
+        finally:
+            if subscriber is not None:
+                notification_hub.unsubscribe(subscriber)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Announce something to everyone booked on a course; runs as a background job with progress
+@main_routes.route('/courses/<int:course_id>/broadcast', methods=['POST'])
+@token_required
+def broadcast_course_notification(current_user, course_id):
+    data = request.get_json()
+
+    if not data or not data.get('message'):
+        return jsonify({'message': 'Missing required fields'}), 400
+
+    course = Course.query.options(load_only(Course.id, Course.instructor_id)).filter_by(id=course_id).first()
+    if not course:
+        return jsonify({'message': 'Course not found'}), 404
+    if current_user.role != 'admin' and current_user.id != course.instructor_id:
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    job = job_runner.submit(
+        current_app._get_current_object(), 'broadcast',
+        lambda job: {'recipients': broadcast_to_course(
+            course_id, data['message'], data.get('type', 'announcement'), progress=job.report
+        )},
+        owner_id=current_user.id
+    )
+    return jsonify({'message': 'Broadcast started', 'job_id': job.id}), 202
+
+# Status and progress of a background job started by this worker
+@main_routes.route('/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_job(current_user, job_id):
+    job = job_runner.get(job_id)
+    if not job:
+        return jsonify({'message': 'Job not found'}), 404
+    if current_user.role != 'admin' and current_user.id != job.owner_id:
+        return jsonify({'message': 'Unauthorized'}), 403
+    return jsonify(job.to_dict()), 200
+
+# Mark many notifications as read with one set-based UPDATE: {"ids": [...]} or {"all": true}
+@main_routes.route('/notifications/<int:user_id>/mark_read', methods=['POST'])
+def mark_notifications_as_read(user_id):
+    data = request.get_json(silent=True) or {}
+
+    ids = data.get('ids')
+    if data.get('all') is not True and not (
+        isinstance(ids, list) and ids and all(isinstance(i, int) for i in ids)
+    ):
+        return jsonify({'message': 'Provide a list of ids or "all": true'}), 400
+
+    query = update(Notification).where(Notification.user_id == user_id, Notification.status == 'unread')
+    if data.get('all') is not True:
+        query = query.where(Notification.id.in_(ids))
+
+    try:
+        with unit_of_work():
+            result = db.session.execute(
+                query.values(status='read'),
+                execution_options={'synchronize_session': False}
+            )
+        # unread_count is computed from the index, so it is consistent as soon as this commits
+        return jsonify({'message': 'Notifications marked as read', 'updated': result.rowcount}), 200
+    except SQLAlchemyError as e:
+        return jsonify({'message': str(e)}), 500
+
 # Create a subscription
 @main_routes.route('/subscriptions', methods=['POST'])
+@idempotent
 def create_subscription():
     data = request.get_json()
 
@@ -219,7 +783,7 @@ def create_subscription():
     user_id = data['user_id']
     plan_type = data['plan_type']
     status = data['status']
-    start_date = data.get('start_date', datetime.utcnow())
+    start_date = data.get('start_date', datetime.datetime.utcnow())
     end_date = data.get('end_date', None)
 
     user = User.query.get(user_id)
@@ -235,11 +799,10 @@ def create_subscription():
     )
 
     try:
-        db.session.add(new_subscription)
-        db.session.commit()
+        with unit_of_work():
+            db.session.add(new_subscription)
         return jsonify({'message': 'Subscription created successfully'}), 201
     except SQLAlchemyError as e:
-        db.session.rollback()
         return jsonify({'message': f'Error creating subscription: {str(e)}'}), 500
     
 # Opret eller opdater profil (for instruktør og kunde)
@@ -294,9 +857,25 @@ def manage_profile():
 
 
 # Get all subscriptions for a user
+SUBSCRIPTION_LIST_FIELDS = {
+    'plan_type': Subscription.plan_name,
+    'status': Subscription.status,
+    'start_date': Subscription.start_date,
+    'end_date': Subscription.end_date,
+}
+
 @main_routes.route('/subscriptions/<int:user_id>', methods=['GET'])
+@conditional('subscriptions', cache_control='private, no-cache')
 def get_subscriptions(user_id):
-    subscriptions = Subscription.query.filter_by(user_id=user_id).all()
+    try:
+        fields = get_fields(SUBSCRIPTION_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    columns = [SUBSCRIPTION_LIST_FIELDS[field] for field in fields]
+    subscriptions = Subscription.query.options(
+        load_only(Subscription.id, *columns)
+    ).filter_by(user_id=user_id).all()
 
     if not subscriptions:
         return jsonify({'message': 'No subscriptions found'}), 404
@@ -304,22 +883,21 @@ def get_subscriptions(user_id):
     subscriptions_list = []
     for subscription in subscriptions:
         subscriptions_list.append({
-            'plan_type': subscription.plan_name,
-            'status': subscription.status,
-            'start_date': subscription.start_date,
-            'end_date': subscription.end_date
+            field: getattr(subscription, SUBSCRIPTION_LIST_FIELDS[field].key) for field in fields
         })
     return jsonify({'subscriptions': subscriptions_list}), 200
 
 
 # Create an invoice for a booking
 @main_routes.route('/invoices', methods=['POST'])
+@rate_limit('30/minute', scopes=('ip', 'user'))
+@idempotent
 def create_invoice():
     data = request.get_json()
 
     # Ensure the required fields are included
     required_fields = ['invoice_number', 'due_date', 'vat_amount', 'cvr_number', 'ean_number', 
-                       'payment_method', 'bank_account', 'note', 'pdf_url', 'user_id']
+                       'payment_method', 'bank_account', 'note', 'pdf_url', 'user_id', 'booking_id', 'amount']
 
     if not data or not all(field in data for field in required_fields):
         return jsonify({'message': 'Missing required fields'}), 400
@@ -335,6 +913,10 @@ def create_invoice():
     note = data['note']
     pdf_url = data['pdf_url']
     user_id = data['user_id']
+    # The dashboard stats attribute revenue through the booking invoiced
+    booking_id = data['booking_id']
+    amount = data['amount']
+    status = data.get('status', 'unpaid')  # 'paid' or 'unpaid'
 
     # Create the invoice object
     new_invoice = Invoice(
@@ -347,15 +929,17 @@ def create_invoice():
         bank_account=bank_account,
         note=note,
         pdf_url=pdf_url,
-        user_id=user_id  # Assuming invoice is tied to a user
+        user_id=user_id,  # Assuming invoice is tied to a user
+        booking_id=booking_id,
+        amount=amount,
+        status=status
     )
 
     try:
-        db.session.add(new_invoice)
-        db.session.commit()
+        with unit_of_work():
+            db.session.add(new_invoice)
         return jsonify({'message': 'Invoice created successfully'}), 201
     except SQLAlchemyError as e:
-        db.session.rollback()
         return jsonify({'message': f'Error creating invoice: {str(e)}'}), 500
     
    
@@ -412,52 +996,187 @@ def create_invoice_template_settings():
     )
 
     try:
-        db.session.add(new_settings)
-        db.session.commit()
+        with unit_of_work():
+            db.session.add(new_settings)
         return jsonify({'message': 'Invoice template settings created successfully'}), 201
     except SQLAlchemyError as e:
-        db.session.rollback()
         return jsonify({'message': f'Error creating template settings: {str(e)}'}), 500
 
 
-# Beskyttet route for admin
+# Columns the admin user listing may return; password_hash and auth_token are never selectable
+ADMIN_USER_FIELDS = {
+    'id': User.id,
+    'username': User.username,
+    'email': User.email,
+    'role': User.role,
+    'is_instructor': User.is_instructor,
+    'created_at': User.created_at,
+    'address': User.address,
+    'zip_code': User.zip_code,
+    'city': User.city,
+    'phone_number': User.phone_number,
+    'reg_number': User.reg_number,
+    'account_number': User.account_number,
+    'stripe_customer_id': User.stripe_customer_id,
+    'subscription_status': User.subscription_status,
+}
+
+# SELECT for the admin listings from ?fields, ?role, ?is_instructor, ?created_from, ?created_to
+# and ?email (prefix). Raises ValueError for invalid parameters.
+def admin_users_query(fields):
+    stmt = select(*[ADMIN_USER_FIELDS[field].label(field) for field in fields], User.id.label('_id'))
+
+    role = request.args.get('role')
+    if role:
+        stmt = stmt.where(User.role == role)
+
+    is_instructor = request.args.get('is_instructor')
+    if is_instructor is not None:
+        if is_instructor.lower() not in ('true', 'false', '1', '0'):
+            raise ValueError('is_instructor must be true or false')
+        stmt = stmt.where(User.is_instructor.is_(is_instructor.lower() in ('true', '1')))
+
+    def date_arg(param):
+        value = request.args.get(param)
+        try:
+            return datetime.datetime.fromisoformat(value) if value else None
+        except ValueError:
+            raise ValueError(f'Invalid {param}, use ISO 8601')
+
+    created_from = date_arg('created_from')
+    created_to = date_arg('created_to')
+    if created_from is not None:
+        stmt = stmt.where(User.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(User.created_at < created_to)
+
+    email = request.args.get('email')
+    if email:
+        # Prefix match, so the unique index on email can be used
+        escaped = email.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        stmt = stmt.where(User.email.like(escaped + '%', escape='\\'))
+
+    return stmt.order_by(User.id)
+
+# Beskyttet route for admin: keyset-paginated, filtered and projected user listing
 @main_routes.route('/admin/users', methods=['GET'])
 @token_required
 def get_all_users(current_user):
     if current_user.role != 'admin':
         return jsonify({'message': 'Unauthorized'}), 403
-    users = User.query.all()
-    return jsonify({'users': [u.serialize() for u in users]})
+    try:
+        fields = get_fields(ADMIN_USER_FIELDS)
+        stmt = admin_users_query(fields)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    limit = get_page_size(default=50, maximum=500)
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            (last_id,) = decode_cursor(cursor)
+            last_id = int(last_id)
+        except (ValueError, TypeError):
+            return jsonify({'message': 'Invalid cursor'}), 400
+        stmt = stmt.where(User.id > last_id)
+
+    rows = db.session.execute(stmt.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    users = [{field: getattr(row, field) for field in fields} for row in rows]
+    next_cursor = encode_cursor(rows[-1]._id) if has_more else None
+    return jsonify({'users': users, 'next_cursor': next_cursor}), 200
+
+# Same filters and fields as /admin/users, streamed as CSV from a server-side cursor
+@main_routes.route('/admin/users/export', methods=['GET'])
+@token_required
+def export_users(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+    try:
+        fields = get_fields(ADMIN_USER_FIELDS)
+        stmt = admin_users_query(fields).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        for row in db.session.execute(stmt):
+            writer.writerow([getattr(row, field) for field in fields])
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    response = Response(stream_with_context(generate()), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename=users.csv'
+    return response
+
+@main_routes.route('/admin/cache-stats', methods=['GET'])
+@token_required
+def get_cache_stats(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+    return jsonify({'auth_users': auth_user_cache.stats()}), 200
+
+# Dashboard totals, read from the incrementally maintained summary table only
+@main_routes.route('/admin/stats', methods=['GET'])
+@token_required
+def get_admin_stats(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+    return jsonify(get_stats(top=get_page_size(default=20, maximum=100))), 200
 
 @main_routes.route('/admin/users/<int:user_id>', methods=['DELETE'])
 @token_required
 def delete_user(current_user, user_id):
     if current_user.role != 'admin':
         return jsonify({'message': 'Unauthorized'}), 403
-    user = User.query.get(user_id)
-    if not user:
+    if db.session.execute(select(User.id).where(User.id == user_id)).first() is None:
         return jsonify({'message': 'User not found'}), 404
-    db.session.delete(user)
-    db.session.commit()
-    return jsonify({'message': 'User deleted'}), 200
 
+    # Bookings, invoices, notifications etc. are removed in batches by a background job.
+    # The job runs in this worker's in-process pool and is not durable: a restart mid-way leaves the
+    # user partly removed (their tokens are already revoked), and only this worker knows the job id,
+    # so /jobs/<job_id> returns 404 on the others. Sending the DELETE again resumes the removal.
+    job = job_runner.submit(
+        current_app._get_current_object(), 'remove_user',
+        lambda job: remove_user(user_id, progress=job.report),
+        owner_id=current_user.id
+    )
+    return jsonify({'message': 'User removal started', 'job_id': job.id}), 202
+
+
+INSTRUCTOR_LIST_FIELDS = {
+    'id': Instructor.id,
+    'user_id': Instructor.user_id,
+    'bio': Instructor.bio,
+    'expertise': Instructor.expertise,
+    'rate': Instructor.rate,
+    'profile_picture': Instructor.profile_picture,
+}
 
 @main_routes.route('/instructors', methods=['GET'])
+@conditional('instructors', cache_control='public, max-age=300')
 def get_instructors():
-    instructors = Instructor.query.all()  # Assuming you have an Instructor model
+    try:
+        fields = get_fields(INSTRUCTOR_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    instructors = Instructor.query.options(
+        load_only(Instructor.id, *[INSTRUCTOR_LIST_FIELDS[field] for field in fields])
+    ).all()
     if not instructors:
         return jsonify({'message': 'No instructors found'}), 404
 
     instructors_list = []
     for instructor in instructors:
-        instructors_list.append({
-            'id': instructor.id,
-            'user_id': instructor.user_id,
-            'bio': instructor.bio,
-            'expertise': instructor.expertise,
-            'rate': instructor.rate,
-            'profile_picture': instructor.profile_picture
-        })
+        instructors_list.append({field: getattr(instructor, field) for field in fields})
     
     return jsonify({'instructors': instructors_list}), 200
 
@@ -490,11 +1209,10 @@ def create_instructor():
     )
 
     try:
-        db.session.add(new_instructor)
-        db.session.commit()
+        with unit_of_work():
+            db.session.add(new_instructor)
         return jsonify({'message': 'Instructor created successfully'}), 201
     except SQLAlchemyError as e:
-        db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
 
@@ -529,11 +1247,10 @@ def delete_instructor(id):
         return jsonify({'message': 'Instructor not found'}), 404
 
     try:
-        db.session.delete(instructor)
-        db.session.commit()
+        with unit_of_work():
+            db.session.delete(instructor)
         return jsonify({'message': 'Instructor deleted successfully'}), 200
     except SQLAlchemyError as e:
-        db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
 
@@ -0,0 +1,329 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event, select, or_
+
+from app.models import db, Course, Category
+
+# Title matches count more than category matches, which count more than description matches
+FIELD_WEIGHTS = {'title': 3.0, 'category': 2.0, 'description': 1.0}
+MAX_PREFIX_EXPANSION = 64
+RANKED_MIN_POSTINGS = 256  # terms in at least this many courses get their ranked postings at build time
+PREFIX_MATCH_FACTOR = 0.7  # a prefix hit ranks below a whole-word hit
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+
+def _document_weights(title, description, category_name):
+    counts = {}
+    for field, text in (('title', title), ('description', description), ('category', category_name)):
+        for token in tokenize(text):
+            key = (token, field)
+            counts[key] = counts.get(key, 0) + 1
+
+    weights = {}
+    for (token, field), tf in counts.items():
+        weights[token] = weights.get(token, 0.0) + FIELD_WEIGHTS[field] * (1 + math.log(tf))
+    return weights
+
+
+# In-process inverted index over course title, description and category name
+class CourseSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}      # token -> {course_id: weight}
+        self._documents = {}     # course_id -> set of tokens (needed to remove a course again)
+        self._terms = []         # sorted tokens, for prefix lookups
+        self._ranked_postings = {}  # token -> [(-weight, course_id)] sorted, for tokens queried alone
+        self._categories = {}    # category_id -> name
+        self._built_at = None
+        self._stale = False
+        self._rebuilding = False
+        self._replay = None      # writes committed while a build runs, applied after the swap
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def build(self):
+        # Loads plain column tuples (no ORM objects) and swaps the new index in at the end
+        with self._lock:
+            self._replay = []
+        try:
+            categories = dict(db.session.execute(select(Category.id, Category.name)).all())
+            rows = db.session.execute(
+                select(Course.id, Course.title, Course.description, Course.category_id)
+            ).yield_per(1000)
+
+            postings = {}
+            documents = {}
+            for course_id, title, description, category_id in rows:
+                weights = _document_weights(title, description, categories.get(category_id))
+                documents[course_id] = set(weights)
+                for token, weight in weights.items():
+                    postings.setdefault(token, {})[course_id] = weight
+        except Exception:
+            with self._lock:
+                self._replay = None
+            raise
+
+        # Sorting the big postings here keeps the first query for a common word fast
+        ranked = {
+            token: sorted((-weight, course_id) for course_id, weight in course_weights.items())
+            for token, course_weights in postings.items() if len(course_weights) >= RANKED_MIN_POSTINGS
+        }
+
+        with self._lock:
+            self._postings = postings
+            self._documents = documents
+            self._terms = sorted(postings)
+            self._ranked_postings = ranked
+            self._categories = categories
+            self._built_at = time.monotonic()
+            self._stale = False
+            # Course writes committed after the snapshot was read
+            for change in self._replay:
+                if change[0] == 'add':
+                    self._add(*change[1:])
+                else:
+                    self._remove(change[1])
+            self._replay = None
+
+    def ensure_fresh(self, max_age):
+        # Never builds inside the request: a missing, stale (category renamed) or old index is
+        # rebuilt in the background, and the current one keeps serving until the swap
+        if self.is_built and not self._stale and (
+            max_age is None or time.monotonic() - self._built_at < max_age
+        ):
+            return
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        app = current_app._get_current_object()
+        threading.Thread(target=self._rebuild_in_background, args=(app,), daemon=True,
+                         name='course-search-build').start()
+
+    def _rebuild_in_background(self, app):
+        try:
+            with app.app_context():
+                self.build()
+        except Exception:
+            app.logger.exception('Course search index build failed')
+        finally:
+            self._rebuilding = False
+
+    def invalidate(self):
+        with self._lock:
+            self._stale = True
+
+    def add(self, course_id, title, description, category_id):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(('add', course_id, title, description, category_id))
+            if self.is_built:
+                self._add(course_id, title, description, category_id)
+
+    def _add(self, course_id, title, description, category_id):
+        self._remove(course_id)
+        weights = _document_weights(title, description, self._categories.get(category_id))
+        self._documents[course_id] = set(weights)
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._terms, token)
+            postings[course_id] = weight
+            ranked = self._ranked_postings.get(token)
+            if ranked is not None:
+                bisect.insort(ranked, (-weight, course_id))
+
+    def remove(self, course_id):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(('remove', course_id))
+            self._remove(course_id)
+
+    def _remove(self, course_id):
+        for token in self._documents.pop(course_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            weight = postings.pop(course_id, None)
+            ranked = self._ranked_postings.get(token)
+            if ranked is not None and weight is not None:
+                i = bisect.bisect_left(ranked, (-weight, course_id))
+                if i < len(ranked) and ranked[i] == (-weight, course_id):
+                    del ranked[i]
+            if not postings:
+                del self._postings[token]
+                self._ranked_postings.pop(token, None)
+                i = bisect.bisect_left(self._terms, token)
+                if i < len(self._terms) and self._terms[i] == token:
+                    del self._terms[i]
+
+    def _expand(self, token, prefix):
+        # Terms the query token matches, with their idf weight. A short prefix can match thousands
+        # of terms: the MAX_PREFIX_EXPANSION most frequent ones are used, so 'p' still finds 'python'
+        total = len(self._documents) or 1
+        if token in self._postings:
+            matches = [(token, math.log(1 + total / len(self._postings[token])))]
+        else:
+            matches = []
+        if prefix:
+            start = bisect.bisect_right(self._terms, token)
+            end = bisect.bisect_left(self._terms, token + '\U0010ffff', start)
+            candidates = self._terms[start:end]
+            if len(candidates) > MAX_PREFIX_EXPANSION:
+                candidates = heapq.nlargest(MAX_PREFIX_EXPANSION, candidates,
+                                            key=lambda term: len(self._postings[term]))
+            for term in candidates:
+                idf = math.log(1 + total / len(self._postings[term]))
+                matches.append((term, idf * PREFIX_MATCH_FACTOR))
+        return matches
+
+    def _ranked(self, term):
+        # Postings of a term as (-weight, course_id), best first; built on first use, then kept sorted
+        ranked = self._ranked_postings.get(term)
+        if ranked is None:
+            ranked = sorted((-weight, course_id) for course_id, weight in self._postings[term].items())
+            self._ranked_postings[term] = ranked
+        return ranked
+
+    def _token_stream(self, matches):
+        # (-score, course_id) for one query token, best first, each course once (at its best term)
+        def stream(ranked, idf):
+            for weight, course_id in ranked:
+                yield weight * idf, course_id
+
+        seen = set()
+        for item in heapq.merge(*[stream(self._ranked(term), idf) for term, idf in matches]):
+            if item[1] not in seen:
+                seen.add(item[1])
+                yield item
+
+    def _token_score(self, matches, course_id):
+        return max(self._postings[term].get(course_id, 0.0) * idf for term, idf in matches)
+
+    def search(self, query, limit=10, prefix=True):
+        # Every query token must match (AND); with prefix=True tokens also match as word prefixes
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        with self._lock:
+            expanded = []
+            for token in dict.fromkeys(tokens):
+                matches = self._expand(token, prefix)
+                if not matches:
+                    return []
+                expanded.append(matches)
+
+            # Threshold algorithm: read every token's postings best-first in turn and score each new
+            # course in full. Once the k-th best score beats the sum of the scores last read (no
+            # unseen course can do better), or one token runs out (no unseen course has all tokens),
+            # the top k are final. Common words therefore cost about k postings, not all of them.
+            streams = [self._token_stream(matches) for matches in expanded]
+            frontier = [math.inf] * len(streams)
+            top = []  # min-heap of (score, -course_id)
+            seen = set()
+            while True:
+                for i, stream in enumerate(streams):
+                    item = next(stream, None)
+                    if item is None:
+                        return self._sorted(top)
+                    frontier[i] = -item[0]
+                    course_id = item[1]
+                    if course_id in seen:
+                        continue
+                    seen.add(course_id)
+                    score = 0.0
+                    for matches in expanded:
+                        token_score = self._token_score(matches, course_id)
+                        if not token_score:
+                            break
+                        score += token_score
+                    else:
+                        if len(top) < limit:
+                            heapq.heappush(top, (score, -course_id))
+                        elif (score, -course_id) > top[0]:
+                            heapq.heapreplace(top, (score, -course_id))
+                if len(top) == limit and top[0][0] > sum(frontier):
+                    return self._sorted(top)
+
+    @staticmethod
+    def _sorted(top):
+        return [(-neg_id, score) for score, neg_id in sorted(top, reverse=True)]
+
+
+course_index = CourseSearchIndex()
+
+
+def fallback_search(query, limit=10):
+    # Used while the index is still being built: title word-prefix matches straight from the
+    # database, all tokens required, unranked (score 0)
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    conditions = []
+    for token in tokens:
+        pattern = token.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append(or_(Course.title.ilike(pattern + '%', escape='\\'),
+                              Course.title.ilike('% ' + pattern + '%', escape='\\')))
+    course_ids = db.session.execute(
+        select(Course.id).where(*conditions).order_by(Course.id).limit(limit)
+    ).scalars().all()
+    return [(course_id, 0.0) for course_id in course_ids]
+
+
+def _changed(obj, *attrs):
+    state = db.inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+
+# Keep the index in step with course writes: collect changes on flush, apply them on commit
+@event.listens_for(db.session, 'after_flush')
+def _collect_course_changes(session, flush_context):
+    pending = session.info.setdefault('search_index_pending', [])
+    for obj in session.new:
+        if isinstance(obj, Course):
+            pending.append(('add', obj.id, obj.title, obj.description, obj.category_id))
+        elif isinstance(obj, Category):
+            pending.append(('invalidate',))
+    for obj in session.dirty:
+        if isinstance(obj, Course) and _changed(obj, 'title', 'description', 'category_id'):
+            pending.append(('add', obj.id, obj.title, obj.description, obj.category_id))
+        elif isinstance(obj, Category) and _changed(obj, 'name'):
+            pending.append(('invalidate',))
+    for obj in session.deleted:
+        if isinstance(obj, Course):
+            pending.append(('remove', obj.id))
+        elif isinstance(obj, Category):
+            pending.append(('invalidate',))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_course_changes(session):
+    for change in session.info.pop('search_index_pending', ()):
+        if change[0] == 'add':
+            course_index.add(*change[1:])
+        elif change[0] == 'remove':
+            course_index.remove(change[1])
+        else:
+            course_index.invalidate()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_course_changes(session):
+    session.info.pop('search_index_pending', None)
@@ -0,0 +1,224 @@
+from sqlalchemy import event, select, delete, func, literal
+
+from app.counters import upsert_increment, committed_value
+from app.models import db, Booking, Course, Invoice, Subscription, DashboardStat
+
+COURSE_BOOKINGS = 'course_bookings'            # per course: number of bookings
+INSTRUCTOR_REVENUE = 'instructor_revenue'      # per instructor: paid invoices and their amount
+ACTIVE_SUBSCRIPTIONS = 'active_subscriptions'  # total: subscriptions with status 'active'
+UNPAID_INVOICES = 'unpaid_invoices'            # total: unpaid invoices and their amount
+
+dashboard_stats = DashboardStat.__table__
+bookings = Booking.__table__
+courses = Course.__table__
+invoices = Invoice.__table__
+subscriptions = Subscription.__table__
+
+
+class _Deltas:
+    def __init__(self):
+        self._deltas = {}
+
+    def add(self, metric, subject_id, count, total=0.0):
+        key = (metric, subject_id)
+        current = self._deltas.get(key, (0, 0.0))
+        self._deltas[key] = (current[0] + count, current[1] + total)
+
+    def __bool__(self):
+        return bool(self._deltas)
+
+    def add_invoice(self, instructor_id, status, amount, sign):
+        amount = (amount or 0.0) * sign
+        if status == 'paid' and instructor_id is not None:
+            self.add(INSTRUCTOR_REVENUE, instructor_id, sign, amount)
+        elif status == 'unpaid':
+            self.add(UNPAID_INVOICES, 0, sign, amount)
+
+    def apply(self, connection):
+        # Sorted, so concurrent transactions update the counter rows in the same order
+        for (metric, subject_id), (count, total) in sorted(self._deltas.items()):
+            if count or total:
+                upsert_increment(connection, dashboard_stats, {'metric': metric, 'subject_id': subject_id},
+                                 {'count': count, 'total': total})
+
+
+def _instructors_for_bookings(connection, booking_ids):
+    booking_ids = {booking_id for booking_id in booking_ids if booking_id is not None}
+    if not booking_ids:
+        return {}
+    return dict(connection.execute(
+        select(bookings.c.id, courses.c.instructor_id)
+        .join(courses, bookings.c.course_id == courses.c.id)
+        .where(bookings.c.id.in_(booking_ids))
+    ).all())
+
+
+@event.listens_for(db.session, 'after_flush')
+def _update_stats(session, flush_context):
+    deltas = _Deltas()
+    invoice_changes = []  # (booking_id, status, amount, sign)
+
+    for obj in session.new:
+        if isinstance(obj, Booking):
+            deltas.add(COURSE_BOOKINGS, obj.course_id, 1)
+        elif isinstance(obj, Invoice):
+            invoice_changes.append((obj.booking_id, obj.status, obj.amount, 1))
+        elif isinstance(obj, Subscription) and obj.status == 'active':
+            deltas.add(ACTIVE_SUBSCRIPTIONS, 0, 1)
+
+    for obj in session.deleted:
+        state = db.inspect(obj)
+        if isinstance(obj, Booking):
+            deltas.add(COURSE_BOOKINGS, committed_value(state, 'course_id'), -1)
+        elif isinstance(obj, Invoice):
+            invoice_changes.append((committed_value(state, 'booking_id'), committed_value(state, 'status'),
+                                    committed_value(state, 'amount'), -1))
+        elif isinstance(obj, Subscription) and committed_value(state, 'status') == 'active':
+            deltas.add(ACTIVE_SUBSCRIPTIONS, 0, -1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, (Booking, Invoice, Subscription)):
+            continue
+        state = db.inspect(obj)
+        if isinstance(obj, Booking) and state.attrs.course_id.history.has_changes():
+            deltas.add(COURSE_BOOKINGS, committed_value(state, 'course_id'), -1)
+            deltas.add(COURSE_BOOKINGS, obj.course_id, 1)
+        elif isinstance(obj, Invoice) and any(
+            state.attrs[attr].history.has_changes() for attr in ('booking_id', 'status', 'amount')
+        ):
+            invoice_changes.append((committed_value(state, 'booking_id'), committed_value(state, 'status'),
+                                    committed_value(state, 'amount'), -1))
+            invoice_changes.append((obj.booking_id, obj.status, obj.amount, 1))
+        elif isinstance(obj, Subscription) and state.attrs.status.history.has_changes():
+            was_active = committed_value(state, 'status') == 'active'
+            if was_active != (obj.status == 'active'):
+                deltas.add(ACTIVE_SUBSCRIPTIONS, 0, 1 if obj.status == 'active' else -1)
+
+    if not deltas and not invoice_changes:
+        return
+
+    # Same connection and transaction as the writes themselves
+    connection = session.connection()
+    if invoice_changes:
+        # Revenue is attributed through booking -> course -> instructor at the time of the write
+        instructors = _instructors_for_bookings(connection, [change[0] for change in invoice_changes])
+        for booking_id, status, amount, sign in invoice_changes:
+            deltas.add_invoice(instructors.get(booking_id), status, amount, sign)
+    deltas.apply(connection)
+
+
+def forget_rows(table, condition):
+    # For set-based Core DELETEs, which the flush listener does not see: subtracts the rows
+    # matching condition from the counters. Call it in the same transaction, before the DELETE.
+    connection = db.session.connection()
+    deltas = _Deltas()
+    if table is bookings:
+        for course_id, count in connection.execute(
+            select(bookings.c.course_id, func.count()).where(condition).group_by(bookings.c.course_id)
+        ):
+            deltas.add(COURSE_BOOKINGS, course_id, -count)
+    elif table is invoices:
+        for instructor_id, status, count, total in connection.execute(
+            select(courses.c.instructor_id, invoices.c.status, func.count(), func.sum(invoices.c.amount))
+            .select_from(invoices)
+            .outerjoin(bookings, invoices.c.booking_id == bookings.c.id)
+            .outerjoin(courses, bookings.c.course_id == courses.c.id)
+            .where(condition)
+            .group_by(courses.c.instructor_id, invoices.c.status)
+        ):
+            if status == 'paid' and instructor_id is not None:
+                deltas.add(INSTRUCTOR_REVENUE, instructor_id, -count, -(total or 0.0))
+            elif status == 'unpaid':
+                deltas.add(UNPAID_INVOICES, 0, -count, -(total or 0.0))
+    elif table is subscriptions:
+        active = connection.execute(
+            select(func.count()).select_from(subscriptions).where(condition, subscriptions.c.status == 'active')
+        ).scalar()
+        deltas.add(ACTIVE_SUBSCRIPTIONS, 0, -active)
+    deltas.apply(connection)
+
+
+def _recompute():
+    columns = ['metric', 'subject_id', 'count', 'total']
+    db.session.execute(delete(dashboard_stats))
+    db.session.execute(dashboard_stats.insert().from_select(columns, select(
+        literal(COURSE_BOOKINGS), bookings.c.course_id, func.count(), literal(0.0)
+    ).group_by(bookings.c.course_id)))
+    db.session.execute(dashboard_stats.insert().from_select(columns, select(
+        literal(INSTRUCTOR_REVENUE), courses.c.instructor_id, func.count(), func.coalesce(func.sum(invoices.c.amount), 0.0)
+    ).select_from(invoices)
+        .join(bookings, invoices.c.booking_id == bookings.c.id)
+        .join(courses, bookings.c.course_id == courses.c.id)
+        .where(invoices.c.status == 'paid')
+        .group_by(courses.c.instructor_id)))
+    db.session.execute(dashboard_stats.insert().from_select(columns, select(
+        literal(UNPAID_INVOICES), literal(0), func.count(), func.coalesce(func.sum(invoices.c.amount), 0.0)
+    ).where(invoices.c.status == 'unpaid')))
+    db.session.execute(dashboard_stats.insert().from_select(columns, select(
+        literal(ACTIVE_SUBSCRIPTIONS), literal(0), func.count(), literal(0.0)
+    ).select_from(subscriptions).where(subscriptions.c.status == 'active')))
+
+
+def rebuild_stats():
+    # Full recomputation from bookings, invoices and subscriptions, for recovery after out-of-band writes
+    _recompute()
+    db.session.commit()
+
+
+def check_stats():
+    # Compares the incrementally maintained counters with a full recomputation (rolled back).
+    # Returns {(metric, subject_id): (stored, recomputed)} for every row that differs.
+    def snapshot():
+        return {
+            (row.metric, row.subject_id): (row.count, round(row.total, 2))
+            for row in db.session.execute(select(dashboard_stats)).all()
+            if row.count or round(row.total, 2)
+        }
+
+    try:
+        stored = snapshot()
+        _recompute()
+        recomputed = snapshot()
+    finally:
+        db.session.rollback()
+    return {
+        key: (stored.get(key, (0, 0.0)), recomputed.get(key, (0, 0.0)))
+        for key in stored.keys() | recomputed.keys()
+        if stored.get(key) != recomputed.get(key)
+    }
+
+
+def get_stats(top=20):
+    # Reads only dashboard_stats: the totals plus the top courses and instructors
+    def ranked(metric, order_by):
+        return db.session.execute(
+            select(dashboard_stats.c.subject_id, dashboard_stats.c.count, dashboard_stats.c.total)
+            .where(dashboard_stats.c.metric == metric, dashboard_stats.c.count > 0)
+            .order_by(order_by.desc(), dashboard_stats.c.subject_id)
+            .limit(top)
+        ).all()
+
+    totals = dict(
+        (row.metric, row) for row in db.session.execute(
+            select(dashboard_stats.c.metric, dashboard_stats.c.count, dashboard_stats.c.total)
+            .where(dashboard_stats.c.metric.in_([ACTIVE_SUBSCRIPTIONS, UNPAID_INVOICES]),
+                   dashboard_stats.c.subject_id == 0)
+        )
+    )
+    unpaid = totals.get(UNPAID_INVOICES)
+    active = totals.get(ACTIVE_SUBSCRIPTIONS)
+    return {
+        'bookings_per_course': [
+            {'course_id': row.subject_id, 'bookings': row.count}
+            for row in ranked(COURSE_BOOKINGS, dashboard_stats.c.count)
+        ],
+        'revenue_per_instructor': [
+            {'instructor_id': row.subject_id, 'paid_invoices': row.count, 'revenue': round(row.total, 2)}
+            for row in ranked(INSTRUCTOR_REVENUE, dashboard_stats.c.total)
+        ],
+        'active_subscriptions': active.count if active else 0,
+        'unpaid_invoices': {
+            'count': unpaid.count if unpaid else 0,
+            'total': round(unpaid.total, 2) if unpaid else 0.0
+        }
+    }
@@ -0,0 +1,152 @@
+from sqlalchemy import select, update, delete, case
+
+from app.auth_cache import invalidate_auth_user
+from app.caching import bump_table_versions
+from app.models import (db, User, Booking, CalendarSyncJob, Course, Invoice, Notification, NotificationArchive,
+                        Subscription, Profile, Instructor, InvoiceTemplateSetting)
+from app.revocation import revoke_user_tokens
+from app.stats import forget_rows
+
+users = User.__table__
+bookings = Booking.__table__
+courses = Course.__table__
+invoices = Invoice.__table__
+calendar_sync_jobs = CalendarSyncJob.__table__
+
+# Rows owned by the user that nothing else references, deleted in this order
+_OWNED_TABLES = (
+    Invoice.__table__,
+    Notification.__table__,
+    NotificationArchive.__table__,
+    Subscription.__table__,
+    Profile.__table__,
+    Instructor.__table__,
+    InvoiceTemplateSetting.__table__,
+)
+
+
+def _delete_in_batches(table, condition, batch_size, counts, progress):
+    # Primary keys first, then DELETE ... WHERE id IN (...): each batch is one short transaction
+    while True:
+        ids = db.session.execute(
+            select(table.c.id).where(condition).order_by(table.c.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            db.session.rollback()
+            return
+        try:
+            forget_rows(table, table.c.id.in_(ids))
+            db.session.execute(delete(table).where(table.c.id.in_(ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        counts[table.name] = counts.get(table.name, 0) + len(ids)
+        if progress:
+            progress(sum(counts.values()))
+
+
+def _delete_bookings(user_id, batch_size, counts, progress):
+    # Each batch also removes the rows hanging off the bookings and gives the seats back
+    while True:
+        rows = db.session.execute(
+            select(bookings.c.id, bookings.c.course_id)
+            .where(bookings.c.user_id == user_id)
+            .order_by(bookings.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            db.session.rollback()
+            return
+
+        booking_ids = [row.id for row in rows]
+        seats = {}
+        for row in rows:
+            seats[row.course_id] = seats.get(row.course_id, 0) + 1
+        try:
+            # Seats first: like book_course, the course row is locked before its dashboard_stats row.
+            # Sorted, so concurrent removals lock course rows in the same order.
+            for course_id, count in sorted(seats.items()):
+                db.session.execute(
+                    update(courses)
+                    .where(courses.c.id == course_id)
+                    .values(seats_booked=case((courses.c.seats_booked > count, courses.c.seats_booked - count),
+                                              else_=0))
+                )
+            # Dashboard counters are adjusted in the same transaction as the deletes
+            forget_rows(invoices, invoices.c.booking_id.in_(booking_ids))
+            forget_rows(bookings, bookings.c.id.in_(booking_ids))
+            db.session.execute(delete(calendar_sync_jobs).where(calendar_sync_jobs.c.booking_id.in_(booking_ids)))
+            invoices_deleted = db.session.execute(
+                delete(invoices).where(invoices.c.booking_id.in_(booking_ids))
+            ).rowcount
+            db.session.execute(delete(bookings).where(bookings.c.id.in_(booking_ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        counts['bookings'] = counts.get('bookings', 0) + len(booking_ids)
+        counts['invoices'] = counts.get('invoices', 0) + invoices_deleted
+        if progress:
+            progress(sum(counts.values()))
+
+
+def _anonymize(user_id):
+    # Keeps the row (and its id) for the courses that still point at it, without personal data
+    return update(users).where(users.c.id == user_id).values(
+        username=f'deleted-user-{user_id}',
+        email=f'deleted-user-{user_id}@invalid',
+        password_hash='!',  # matches no password
+        role='deleted',
+        address=None,
+        zip_code=None,
+        city=None,
+        phone_number=None,
+        reg_number=None,
+        account_number=None,
+        auth_token=None,
+        stripe_customer_id=None,
+        subscription_status=None
+    )
+
+
+def remove_user(user_id, batch_size=1000, progress=None):
+    # Removes a user and everything they own with set-based statements in bounded batches.
+    # Users who still teach courses are anonymized instead, since other people's bookings
+    # reference those courses. Returns the number of rows removed per table.
+    # Every batch commits on its own, so an interrupted run leaves the user partly removed;
+    # calling it again picks up from the rows that are left.
+    if db.session.execute(select(users.c.id).where(users.c.id == user_id)).first() is None:
+        db.session.rollback()
+        return None
+
+    # Lock the account out first, so nothing new is written while the batches run
+    try:
+        revoke_user_tokens(user_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    invalidate_auth_user(user_id)
+
+    counts = {}
+    _delete_bookings(user_id, batch_size, counts, progress)
+    for table in _OWNED_TABLES:
+        _delete_in_batches(table, table.c.user_id == user_id, batch_size, counts, progress)
+
+    teaches = db.session.execute(
+        select(courses.c.id).where(courses.c.instructor_id == user_id).limit(1)
+    ).first() is not None
+    try:
+        if teaches:
+            db.session.execute(_anonymize(user_id))
+        else:
+            db.session.execute(delete(users).where(users.c.id == user_id))
+        bump_table_versions(db.session.connection(), ('users', 'instructors', 'subscriptions'))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    invalidate_auth_user(user_id)
+
+    return {'user_id': user_id, 'anonymized': teaches, 'deleted': counts}
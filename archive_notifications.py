@@ -0,0 +1,26 @@
+import argparse
+
+from app import create_app
+from app.retention import archive_read_notifications
+
+# Opret Flask app context
+app = create_app()
+
+# Move old read notifications into notifications_archive (run from cron)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Notification retention job")
+    parser.add_argument("--days", type=int, default=app.config['NOTIFICATION_RETENTION_DAYS'],
+                        help="Archive read notifications older than this many days")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many rows would move")
+    args = parser.parse_args()
+
+    with app.app_context():
+        result = archive_read_notifications(args.days, batch_size=args.batch_size, dry_run=args.dry_run,
+                                            pause=args.pause, progress=lambda n: print(f"  archived {n}"))
+
+    if result['dry_run']:
+        print(f"Dry run: {result['matched']} read notifications older than {result['cutoff']:%Y-%m-%d} would be archived")
+    else:
+        print(f"✅ Archived {result['archived']} read notifications older than {result['cutoff']:%Y-%m-%d}")
@@ -0,0 +1,187 @@
+import argparse
+import http.client
+import json
+import os
+import resource
+import selectors
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from config import Config
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_until_listening(host, port, server, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            sys.exit("❌ Server exited during startup")
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    sys.exit("❌ Server did not start listening")
+
+
+def open_stream(host, port, user_id):
+    # Raw socket, so the benchmark itself does not need a thread per connection
+    sock = socket.create_connection((host, port), timeout=10)
+    sock.sendall(f"GET /notifications/{user_id}/stream HTTP/1.1\r\nHost: {host}\r\n"
+                 f"Accept: text/event-stream\r\n\r\n".encode())
+    received = b""
+    while b"retry:" not in received:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise ConnectionError("stream closed before the first event")
+        received += chunk
+    sock.setblocking(False)
+    return sock
+
+
+def worker_status(master_pid):
+    # RSS and OS thread count of the (single) gevent worker
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+        worker_pid = int(f.read().split()[0])
+    status = {}
+    with open(f"/proc/{worker_pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            status[key] = value.strip()
+    return int(status["VmRSS"].split()[0]) // 1024, int(status["Threads"])
+
+
+def api_request(host, port, method, path, body=None):
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    started = time.perf_counter()
+    connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                       headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.status, (time.perf_counter() - started) * 1000
+
+
+def read_ready(sockets, timeout):
+    # Returns {socket: bytes received} for sockets with data, b"" for the ones the server closed
+    received = {}
+    with selectors.DefaultSelector() as selector:
+        for sock in sockets:
+            selector.register(sock, selectors.EVENT_READ)
+        for key, _ in selector.select(timeout):
+            try:
+                received[key.fileobj] = key.fileobj.recv(65536)
+            except (BlockingIOError, ConnectionError):
+                received[key.fileobj] = b""
+    return received
+
+
+# Thousands of idle SSE connections on one gevent worker (gunicorn_streams.conf.py), using a
+# scratch SQLite database. Checks every stream stays open and a notification still gets delivered.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Notification stream capacity benchmark")
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--watchers", type=int, default=10, help="streams for the user who gets notified")
+    parser.add_argument("--hold", type=int, default=20, help="seconds to keep the streams idle")
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+    host = "127.0.0.1"
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < args.connections + 256:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, args.connections + 256), hard))
+
+    scratch = tempfile.mkdtemp(prefix="bench-streams-")
+    database_url = f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+    Config.SQLALCHEMY_DATABASE_URI = database_url
+    from app import create_app
+    from app.models import db, User, Category, Course
+
+    app = create_app()
+    with app.app_context():
+        instructor = User(username="bench-instructor", email="bench-instructor@example.com",
+                          password_hash="!", role="instructor", is_instructor=True)
+        student = User(username="bench-student", email="bench-student@example.com",
+                       password_hash="!", role="student")
+        category = Category(name="Bench")
+        db.session.add_all([instructor, student, category])
+        db.session.flush()
+        course = Course(title="Bench course", description="Bench", price=0, category_id=category.id,
+                        instructor_id=instructor.id, capacity=10)
+        db.session.add(course)
+        db.session.commit()
+        student_id, course_id = student.id, course.id
+        db.session.remove()
+
+    env = dict(os.environ, DATABASE_URL=database_url, STREAMS_BIND=f"{host}:{args.port}",
+               STREAMS_WORKERS="1", STREAMS_WORKER_CONNECTIONS=str(args.connections + 100))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_streams.conf.py", "--log-level", "warning",
+         "app:create_app()"],
+        cwd=BASE_DIR, env=env
+    )
+    streams = []
+    try:
+        wait_until_listening(host, args.port, server)
+        api_request(host, args.port, "GET", f"/notifications/{student_id}/unread_count")  # worker loads the app
+        rss_before, threads_before = worker_status(server.pid)
+
+        started = time.perf_counter()
+        failed = 0
+        for i in range(args.connections):
+            # Watchers follow the student; the rest are users who never get a notification
+            user_id = student_id if i < args.watchers else 1000000 + i
+            try:
+                streams.append(open_stream(host, args.port, user_id))
+            except OSError:
+                failed += 1
+        open_time = time.perf_counter() - started
+        rss_open, threads_open = worker_status(server.pid)
+
+        # Idle period: the worker only sends heartbeats; a regular request must still be fast
+        latencies = []
+        heartbeats = set()
+        closed = set()
+        deadline = time.time() + args.hold
+        while time.time() < deadline:
+            _, latency = api_request(host, args.port, "GET", f"/notifications/{student_id}/unread_count")
+            latencies.append(latency)
+            for sock, data in read_ready([s for s in streams if s not in closed], 1).items():
+                if not data:
+                    closed.add(sock)
+                elif b": heartbeat" in data:
+                    heartbeats.add(sock)
+
+        status, book_latency = api_request(host, args.port, "POST", "/book",
+                                           {"user_id": student_id, "course_id": course_id})
+        watchers = streams[:args.watchers]
+        delivered = set()
+        deadline = time.time() + 5
+        while len(delivered) < len(watchers) and time.time() < deadline:
+            for sock, data in read_ready([s for s in watchers if s not in delivered], 0.5).items():
+                if b"event: notification" in data:
+                    delivered.add(sock)
+        rss_end, threads_end = worker_status(server.pid)
+    finally:
+        for sock in streams:
+            sock.close()
+        server.terminate()
+        server.wait()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    latencies.sort()
+    print(f"Streams opened:    {len(streams)} of {args.connections} in {open_time:.1f} s ({failed} failed)")
+    print(f"Worker RSS:        {rss_before} MB idle, {rss_open} MB with streams open, {rss_end} MB at the end "
+          f"(~{(rss_open - rss_before) * 1024 / max(len(streams), 1):.0f} KB per stream)")
+    print(f"Worker threads:    {threads_before} before, {threads_open} with streams open, {threads_end} at the end")
+    print(f"Held idle:         {args.hold} s, {len(closed)} closed by the server, "
+          f"{len(heartbeats)} heartbeats seen")
+    print(f"API during hold:   {len(latencies)} requests, median {latencies[len(latencies) // 2]:.1f} ms, "
+          f"max {latencies[-1]:.1f} ms")
+    print(f"POST /book:        {status} in {book_latency:.1f} ms, notification delivered to "
+          f"{len(delivered)} of {len(watchers)} watching streams")
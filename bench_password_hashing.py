@@ -0,0 +1,35 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash
+
+from config import Config
+from app.hashing import PasswordHasher
+
+# Measure login (password verify) throughput at the configured hash cost
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Password hashing benchmark")
+    parser.add_argument("--method", default=Config.PASSWORD_HASH_METHOD)
+    parser.add_argument("--workers", type=int, default=Config.PASSWORD_HASH_WORKERS or os.cpu_count())
+    parser.add_argument("--logins", type=int, default=64)
+    args = parser.parse_args()
+
+    stored = generate_password_hash("benchmark-password", method=args.method)
+    hasher = PasswordHasher(method=args.method, max_workers=args.workers, max_pending=args.logins)
+
+    started = time.perf_counter()
+    hasher.verify(stored, "benchmark-password")
+    single = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.logins) as clients:
+        results = list(clients.map(lambda _: hasher.verify(stored, "benchmark-password"), range(args.logins)))
+    elapsed = time.perf_counter() - started
+    assert all(results)
+
+    print(f"Method:            {stored.split('$', 1)[0]}")
+    print(f"Single verify:     {single * 1000:.1f} ms")
+    print(f"Pool throughput:   {args.logins / elapsed:.1f} logins/s with {args.workers} workers")
+    print(f"Per core:          {args.logins / elapsed / args.workers:.1f} logins/s")
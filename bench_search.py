@@ -0,0 +1,88 @@
+import argparse
+import random
+import string
+import time
+
+from config import Config
+
+COMMON_WORDS = ['python', 'programming', 'learn', 'data', 'science', 'web', 'design', 'introduction',
+                'advanced', 'beginner', 'javascript', 'machine', 'learning', 'analysis', 'project',
+                'management', 'marketing', 'photography', 'painting', 'public', 'speaking', 'personal',
+                'productivity', 'finance', 'excel', 'statistics', 'cloud', 'security', 'network', 'course']
+
+
+def synthetic_vocabulary(size, rng):
+    # Random filler words, with the real course words spread over the most frequent ranks
+    words = set()
+    while len(words) < size - len(COMMON_WORDS):
+        word = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10)))
+        if word not in COMMON_WORDS:
+            words.add(word)
+    words = sorted(words)
+    rng.shuffle(words)
+    for i, word in enumerate(COMMON_WORDS):
+        words.insert(i * 3, word)
+    return words
+
+
+def zipf_sampler(words, rng):
+    # Word i is drawn with weight 1/(i+1): a few very common words and a long tail
+    weights = [1.0 / (i + 1) for i in range(len(words))]
+    return lambda k: rng.choices(words, weights=weights, k=k)
+
+
+# Search latency on a synthetic catalog (in-memory SQLite, nothing is written to the configured database)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Course search benchmark")
+    parser.add_argument("--courses", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--queries", nargs="*",
+                        default=["p", "py", "python", "learn data", "python prog", "data sci", "xq"])
+    args = parser.parse_args()
+
+    Config.SQLALCHEMY_DATABASE_URI = "sqlite://"
+    from app import create_app
+    from app.models import db, User, Category, Course
+    from app.search import CourseSearchIndex
+
+    app = create_app()
+    rng = random.Random(42)
+    sample = zipf_sampler(synthetic_vocabulary(args.vocabulary, rng), rng)
+
+    with app.app_context():
+        instructor = User(username="bench", email="bench@example.com", password_hash="!", role="instructor")
+        categories = [Category(name=' '.join(sample(2)).title()) for _ in range(20)]
+        db.session.add(instructor)
+        db.session.add_all(categories)
+        db.session.commit()
+        category_ids = [category.id for category in categories]
+
+        rows = [{
+            'title': ' '.join(sample(rng.randint(3, 7))).title(),
+            'description': ' '.join(sample(rng.randint(20, 40))),
+            'price': rng.choice([0, 99, 199, 499, 999]),
+            'category_id': rng.choice(category_ids),
+            'instructor_id': instructor.id,
+            'version': 1,
+            'seats_booked': 0,
+        } for _ in range(args.courses)]
+        db.session.execute(Course.__table__.insert(), rows)
+        db.session.commit()
+
+        index = CourseSearchIndex()
+        started = time.perf_counter()
+        index.build()
+        build_time = time.perf_counter() - started
+
+    print(f"Courses:           {args.courses} ({len(index._terms)} distinct terms), built in {build_time:.1f} s")
+    for query in args.queries:
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            results = index.search(query, limit=10)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{query!r:20} median {timings[len(timings) // 2]:6.1f} ms   p95 {p95:6.1f} ms   "
+              f"{len(results)} results")
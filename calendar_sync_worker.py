@@ -0,0 +1,31 @@
+import argparse
+import time
+
+from app import create_app
+from app.calendar_sync import run_worker, FakeCalendarClient
+
+# Opret Flask app context
+app = create_app()
+
+# Push queued bookings to the calendar (Booking.google_calendar_event_id)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calendar sync worker")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--poll-interval", type=float, default=5.0)
+    parser.add_argument("--once", action="store_true", help="Stop when the queue is empty")
+    parser.add_argument("--fake", action="store_true", help="Use the offline fake calendar client")
+    parser.add_argument("--fake-latency", type=float, default=0.0, help="Seconds per fake API call")
+    args = parser.parse_args()
+
+    client = app.config.get('CALENDAR_CLIENT')
+    if args.fake:
+        client = FakeCalendarClient(latency=args.fake_latency)
+    if client is None:
+        parser.error("No CALENDAR_CLIENT configured; use --fake to run against the offline client")
+
+    started = time.perf_counter()
+    handled = run_worker(app, client, workers=args.workers, batch_size=args.batch_size,
+                         poll_interval=args.poll_interval, once=args.once)
+    elapsed = time.perf_counter() - started
+    print(f"✅ Synced {handled} bookings in {elapsed:.2f}s ({handled / elapsed if elapsed else 0:.0f}/s)")
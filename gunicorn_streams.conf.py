@@ -0,0 +1,27 @@
+import os
+import resource
+
+# Server for the notification SSE streams: gunicorn -c gunicorn_streams.conf.py "app:create_app()"
+#
+# An idle stream is a greenlet waiting on its subscriber queue, not an OS thread, so one worker
+# holds thousands of them. The proxy sends only /notifications/<id>/stream here; the rest of the
+# API stays on the threaded server, because CPU-bound requests (password hashing, exports)
+# would block the event loop and stall every open stream on this worker.
+#
+# The default in-process notification hub only delivers what the same process commits, so once
+# the API runs elsewhere NOTIFICATION_HUB_BACKEND must be a shared backend. Without one, run a
+# single worker of this server for all routes (what bench_notification_streams.py does).
+
+bind = os.environ.get('STREAMS_BIND', '127.0.0.1:5001')
+worker_class = 'gevent'
+workers = int(os.environ.get('STREAMS_WORKERS', 1))
+worker_connections = int(os.environ.get('STREAMS_WORKER_CONNECTIONS', 10000))  # open streams per worker
+timeout = 30  # only applies to a worker whose event loop is stuck; open streams do not count
+graceful_timeout = 5
+keepalive = 5
+
+# The worker needs one file descriptor per stream, plus database connections and log files
+soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+wanted = worker_connections + 1024
+if soft < wanted and (hard == resource.RLIM_INFINITY or hard >= wanted):
+    resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
@@ -0,0 +1,77 @@
+import argparse
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+from config import Config
+
+# Hammer POST /book for a single course from many parallel clients and check for oversells.
+# Writes a course and --clients users, so point it at a scratch database.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent booking load test")
+    parser.add_argument("--database-url", default=Config.SQLALCHEMY_DATABASE_URI)
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--capacity", type=int, default=50)
+    args = parser.parse_args()
+
+    Config.SQLALCHEMY_DATABASE_URI = args.database_url
+    if not args.database_url.startswith("sqlite"):
+        # One connection per client, so the database (not the pool) decides who waits
+        Config.SQLALCHEMY_ENGINE_OPTIONS = {"pool_size": args.clients, "max_overflow": 0}
+
+    from app import create_app
+    from app.models import db, User, Course, Category, Booking
+
+    app = create_app()
+    app.config["RATE_LIMIT_ENABLED"] = False
+
+    run = uuid.uuid4().hex[:8]
+    with app.app_context():
+        instructor = User(username=f"load-{run}-instructor", email=f"load-{run}-instructor@example.com",
+                          password_hash="!", role="instructor", is_instructor=True)
+        category = Category(name=f"Load test {run}")
+        db.session.add_all([instructor, category])
+        db.session.flush()
+        course = Course(title=f"Load test {run}", description="Load test course", price=0,
+                        category_id=category.id, instructor_id=instructor.id, capacity=args.capacity)
+        students = [User(username=f"load-{run}-{i}", email=f"load-{run}-{i}@example.com",
+                         password_hash="!", role="student") for i in range(args.clients)]
+        db.session.add(course)
+        db.session.add_all(students)
+        db.session.commit()
+        course_id = course.id
+        student_ids = [student.id for student in students]
+
+    start = threading.Barrier(args.clients)
+
+    def book(user_id):
+        client = app.test_client()
+        start.wait()
+        response = client.post("/book", json={"user_id": user_id, "course_id": course_id})
+        message = (response.get_json(silent=True) or {}).get("message", "")
+        return response.status_code, "deadlock" in message.lower() or "1213" in message
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as clients:
+        results = list(clients.map(book, student_ids))
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        booked = db.session.execute(
+            select(func.count()).select_from(Booking).where(Booking.course_id == course_id)
+        ).scalar()
+        seats_booked = db.session.execute(select(Course.seats_booked).where(Course.id == course_id)).scalar()
+
+    statuses = Counter(status for status, _ in results)
+    deadlocks = sum(1 for _, deadlock in results if deadlock)
+
+    print(f"Database:          {args.database_url.split('@')[-1]}")
+    print(f"Clients:           {args.clients} against capacity {args.capacity} in {elapsed:.2f} s")
+    print(f"Responses:         {dict(sorted(statuses.items()))}")
+    print(f"Bookings / seats:  {booked} / {seats_booked}")
+    print(f"Oversold:          {max(booked - args.capacity, 0)}")
+    print(f"Server errors:     {statuses.get(500, 0)} ({deadlocks} deadlocks)")
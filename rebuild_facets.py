@@ -0,0 +1,11 @@
+from app import create_app
+from app.facets import rebuild_facets
+
+# Opret Flask app context
+app = create_app()
+
+# Recompute the per-category course counts and price histograms from the courses table
+if __name__ == "__main__":
+    with app.app_context():
+        rebuild_facets()
+        print("✅ Category facets rebuilt")
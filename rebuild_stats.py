@@ -0,0 +1,26 @@
+import argparse
+
+from app import create_app
+from app.stats import rebuild_stats, check_stats
+
+# Opret Flask app context
+app = create_app()
+
+# Recompute the admin dashboard counters from bookings, invoices and subscriptions
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or check the dashboard stats")
+    parser.add_argument("--check", action="store_true",
+                        help="only compare the stored counters with a recomputation; exit 1 on drift")
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.check:
+            drift = check_stats()
+            for (metric, subject_id), (stored, recomputed) in sorted(drift.items()):
+                print(f"❌ {metric} {subject_id}: stored {stored}, recomputed {recomputed}")
+            if drift:
+                raise SystemExit(1)
+            print("✅ Dashboard stats match a full recomputation")
+        else:
+            rebuild_stats()
+            print("✅ Dashboard stats rebuilt")